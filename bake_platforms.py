@@ -0,0 +1,49 @@
+"""Запекание повёрнутых изображений платформ в CACHE_DIR/rotations.
+
+Для каждого размера платформы запекаются все углы, которые встречаются в уровнях, и сетка
+редактора с шагом EDITOR_ANGLE_STEP. Размеры обрабатываются параллельно в пуле процессов.
+Файлы называются по хэшу изображения, поэтому после замены ассета старые просто не находятся.
+
+Запуск: python bake_platforms.py [файлы уровней]
+"""
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from headless import init_dummy_display
+from populate_levels import get_level_files
+from sprites import Platform, Size, bake_rotations
+
+# Шаг поворота колесом мыши в level_editor.py
+EDITOR_ANGLE_STEP = 5
+
+
+def get_level_angles(files):
+    angles = set()
+    for file in files:
+        with open(file) as f:
+            angles.update(d.get('angle', 0) for d in json.load(f)['map']['platforms'])
+    return angles
+
+
+def bake_platform(size, angles):
+    return bake_rotations(Platform.SPRITE_FILENAME_TEMPLATE % size, Platform.SPRITE_SCALE_COEF, angles)
+
+
+def main():
+    files = sys.argv[1:] or get_level_files()
+    angles = get_level_angles(files) | {float(a) for a in range(0, 360, EDITOR_ANGLE_STEP)}
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(initializer=init_dummy_display) as pool:
+        paths = list(pool.map(bake_platform, Size.sizes(), [angles] * len(Size.sizes())))
+
+    for path in paths:
+        print(path)
+    print(f"Запечено {len(angles) - (0 in angles)} углов для {len(paths)} размеров "
+          f"за {time.perf_counter() - start:.2f} с")
+
+
+if __name__ == '__main__':
+    main()
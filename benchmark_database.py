@@ -0,0 +1,81 @@
+"""Сравнение задержки одного вызова: новое соединение на каждый вызов против общего соединения.
+
+Запуск: python benchmark_database.py [число повторов]. Работает с копией game.db во временном каталоге.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import database
+
+
+def per_call_get_balance(path):
+    conn = sqlite3.connect(path)
+    balance = conn.execute('SELECT balance FROM User WHERE id = 1').fetchone()[0]
+    conn.close()
+    return balance
+
+
+def per_call_get_all_levels(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    levels = [dict(row) for row in conn.execute('SELECT * FROM Level ORDER BY id')]
+    conn.close()
+    return levels
+
+
+def per_call_level_win(path, level_id, coins_collected, time_spent):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute("UPDATE Level SET unlocked = 1 WHERE id = ? AND cost IS NULL", (level_id + 1,))
+    c.execute('SELECT coins_collected, time_spent FROM Level WHERE id = ?', (level_id,))
+    c.fetchone()
+    c.execute('UPDATE Level SET coins_collected = ?, time_spent = ? WHERE id = ?',
+              (coins_collected, time_spent, level_id))
+    conn.commit()
+    conn.close()
+
+
+def measure(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_path = os.path.join(tmp, 'before.db')
+        after_path = os.path.join(tmp, 'after.db')
+        shutil.copy(database.DB_PATH, before_path)
+        shutil.copy(database.DB_PATH, after_path)
+
+        database.DB_PATH = after_path
+        cases = [
+            ('get_balance',
+             lambda: per_call_get_balance(before_path),
+             database.get_balance),
+            ('get_all_levels',
+             lambda: per_call_get_all_levels(before_path),
+             database.get_all_levels),
+            ('level_win',
+             lambda: per_call_level_win(before_path, 1, None, None),
+             lambda: database.level_win(1)),
+        ]
+
+        print(f"{'вызов':<16}{'до, мкс':>12}{'после, мкс':>14}{'ускорение':>12}")
+        for name, before, after in cases:
+            before_us = measure(before, repeats)
+            after_us = measure(after, repeats)
+            print(f"{name:<16}{before_us:>12.1f}{after_us:>14.1f}{before_us / after_us:>11.1f}x")
+
+        database.close_connection()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Размер и время загрузки уровней: JSON против двоичного формата level_format.
+
+Запуск: python benchmark_level_format.py [число прогонов]. Двоичные копии пишутся во временный каталог.
+"""
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import gc
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pygame
+
+import level_format
+from level import Level
+from populate_levels import get_level_files
+
+
+def measure(func, files, repeats):
+    """Лучшее из repeats прогонов по всем файлам, мкс на файл"""
+    best = float('inf')
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        for file in files:
+            func(file)
+        best = min(best, time.perf_counter() - start)
+    return best / len(files) * 1e6
+
+
+def load_json(file):
+    with open(file) as f:
+        return json.load(f)
+
+
+def read_binary(file):
+    level = level_format.BinaryLevel(file)
+    return [list(level.records(name)) for name, _ in level_format.SECTIONS]
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    pygame.init()
+
+    json_files = get_level_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        binary_files = [level_format.convert(file, Path(tmp) / (file.stem + '.lvl')) for file in json_files]
+
+        json_size = sum(os.path.getsize(file) for file in json_files)
+        binary_size = sum(os.path.getsize(file) for file in binary_files)
+        print(f"Размер {len(json_files)} уровней: JSON {json_size} байт, двоичный {binary_size} байт "
+              f"({json_size / binary_size:.1f}x меньше)")
+
+        cases = [
+            ('чтение файла', load_json, read_binary, repeats),
+            ('чтение + Level', lambda file: Level(1, load_json(file)),
+             lambda file: Level(1, level_format.BinaryLevel(file)), max(1, repeats // 10)),
+        ]
+
+        print(f"{'на уровень':<16}{'JSON, мкс':>12}{'двоичный, мкс':>16}{'ускорение':>12}")
+        for name, from_json, from_binary, case_repeats in cases:
+            json_us = measure(from_json, json_files, case_repeats)
+            binary_us = measure(from_binary, binary_files, case_repeats)
+            print(f"{name:<16}{json_us:>12.1f}{binary_us:>16.1f}{json_us / binary_us:>11.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Время миграций при запуске игры.
+
+Запуск: python benchmark_migrations.py [число повторов]. Работает с копией game.db во временном каталоге.
+Завершается с ошибкой, если проверка актуальной схемы дольше STARTUP_BUDGET_MS.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import database
+from migrations import run_migrations, SCHEMA_VERSION
+
+# Столько может занять проверка схемы при обычном запуске, когда миграций нет
+STARTUP_BUDGET_MS = 5
+
+
+def measure_once(path):
+    """Время первого запуска: новое соединение и все нужные миграции"""
+    database.DB_PATH = path
+    start = time.perf_counter()
+    applied = run_migrations()
+    elapsed = (time.perf_counter() - start) * 1000
+    database.close_connection()
+    return applied, elapsed
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        empty_path = os.path.join(tmp, 'empty.db')
+        repo_path = os.path.join(tmp, 'game.db')
+        shutil.copy('game.db', repo_path)
+
+        for name, path in (('пустая БД', empty_path), ('game.db', repo_path)):
+            applied, elapsed = measure_once(path)
+            print(f"{name}: применено {applied} из {SCHEMA_VERSION} миграций за {elapsed:.2f} мс")
+
+        timings = []
+        for _ in range(repeats):
+            applied, elapsed = measure_once(repo_path)
+            assert applied == 0
+            timings.append(elapsed)
+
+        timings.sort()
+        median, worst = timings[len(timings) // 2], timings[-1]
+        print(f"Схема актуальна, {repeats} запусков: медиана {median:.2f} мс, максимум {worst:.2f} мс "
+              f"(бюджет {STARTUP_BUDGET_MS} мс)")
+
+        if median > STARTUP_BUDGET_MS:
+            sys.exit("Проверка схемы при запуске не укладывается в бюджет")
+
+
+if __name__ == '__main__':
+    main()
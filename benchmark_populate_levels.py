@@ -0,0 +1,85 @@
+"""Импорт тысяч уровней: последовательный разбор и вставка по строке против пакетного режима.
+
+Запуск: python benchmark_populate_levels.py [число уровней]. Уровни — копии файлов из levels/
+во временном каталоге, БД — копия game.db там же.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import database
+import populate_levels
+
+
+def make_levels(target, count):
+    sources = populate_levels.get_level_files()
+    manifest = {}
+    for i in range(1, count + 1):
+        source = sources[(i - 1) % len(sources)]
+        shutil.copy(source, target / f"level_{i}.json")
+        # Без бонусных: их id начинаются с 1001 и при тысячах уровней совпали бы с id обычных
+        manifest[f"level_{i}.json"] = {"difficulty": "MEDIUM"}
+
+    with open(target / "manifest.json", "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def serial_import(db_path, manifest):
+    """Прежний путь populate_levels.main без вопросов в stdin"""
+    levels = populate_levels.get_level_metadata()
+    conn = sqlite3.connect(db_path)
+    bonus_count = 0
+    for i, level in enumerate(levels, 1):
+        cost = manifest[Path(level['map_filepath']).name].get("cost")
+        bonus_count += bool(cost)
+        conn.execute('''INSERT OR REPLACE INTO Level
+                        (id, difficulty, map_filepath, max_coins, unlocked, cost)
+                        VALUES (?, ?, ?, ?, ?, ?)''',
+                     (i - bonus_count if not cost else bonus_count + 1000,
+                      "MEDIUM", level['map_filepath'], level['max_coins'], 1 if i == 1 else 0, cost))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        levels_dir = Path(tmp) / "levels"
+        levels_dir.mkdir()
+        manifest = make_levels(levels_dir, count)
+
+        serial_path = os.path.join(tmp, 'serial.db')
+        shutil.copy('game.db', serial_path)
+        database.DB_PATH = os.path.join(tmp, 'batch.db')
+        shutil.copy('game.db', database.DB_PATH)
+        populate_levels.LEVELS_DIR = levels_dir
+
+        start = time.perf_counter()
+        serial_import(serial_path, manifest)
+        print(f"Последовательно, {count} уровней: {time.perf_counter() - start:.2f} с")
+
+        start = time.perf_counter()
+        written, _ = populate_levels.sync_levels(levels_dir / "manifest.json")
+        print(f"Пакетно, первый импорт: записано {written} за {time.perf_counter() - start:.2f} с")
+
+        for i in range(1, count + 1, 100):
+            with open(levels_dir / f"level_{i}.json", "a") as f:
+                f.write("\n")
+
+        start = time.perf_counter()
+        written, skipped = populate_levels.sync_levels(levels_dir / "manifest.json")
+        print(f"Пакетно, повторный импорт: записано {written}, без изменений {skipped} "
+              f"за {time.perf_counter() - start:.2f} с")
+
+        database.close_connection()
+
+
+if __name__ == '__main__':
+    main()
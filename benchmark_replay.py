@@ -0,0 +1,84 @@
+"""Проверка повтором тысяч сохранённых попыток.
+
+Запуск: python benchmark_replay.py [число попыток] [тиков на попытку].
+Попытки со случайным вводом проигрываются по уровням из game.db и записываются в копию БД
+во временном каталоге, затем replay.verify_runs проигрывает их заново по записанному вводу.
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import pygame
+
+import database
+import replay
+from database import RunOutcome
+from headless import init_dummy_display
+from level import Status
+from level_format import load_level_data
+from migrations import run_migrations
+from simulation import LevelSimulation, RECORDED_KEYS, encode_inputs
+
+OUTCOMES = {Status.FINISHED: RunOutcome.WIN, Status.FAILED: RunOutcome.FAIL, Status.IN_PROGRESS: RunOutcome.ABANDONED}
+
+
+def random_inputs(ticks, rnd):
+    """Случайный ввод: клавиши нажимаются и отпускаются в среднем раз в 10 тиков"""
+    inputs = []
+    tick = 0
+    while True:
+        tick += rnd.randint(0, 20)
+        if tick >= ticks:
+            return sorted(inputs, key=lambda x: x[0])
+        key = rnd.choice(RECORDED_KEYS)
+        inputs.append((tick, pygame.KEYDOWN, key))
+        inputs.append((tick + rnd.randint(0, 30), pygame.KEYUP, key))
+
+
+def record_runs(count, ticks, seed=0):
+    rnd = random.Random(seed)
+    levels = [level for level in database.get_all_levels() if os.path.exists(level['map_filepath'])]
+    level_data = {level['id']: load_level_data(level['map_filepath']) for level in levels}
+
+    with database.transaction() as conn:
+        for _ in range(count):
+            level_id = rnd.choice(levels)['id']
+            inputs = random_inputs(ticks, rnd)
+            simulation = LevelSimulation(level_id, level_data[level_id], inputs)
+            status = simulation.run(ticks)
+            database.write_run(conn, level_id, OUTCOMES[status], simulation.elapsed_time,
+                               simulation.level.coins_collected(), simulation.level.fail_cause,
+                               simulation.ticks, encode_inputs(inputs[:simulation.input_index]))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'game.db')
+        shutil.copy('game.db', database.DB_PATH)
+        run_migrations()
+        init_dummy_display()
+
+        start = time.perf_counter()
+        record_runs(count, ticks)
+        print(f"Запись {count} попыток до {ticks} тиков: {time.perf_counter() - start:.1f} с")
+
+        runs = database.get_recorded_runs()
+        total_ticks = sum(run['ticks'] for run in runs)
+        size = sum(len(run['inputs']) for run in runs)
+        print(f"Записанный ввод: {size / len(runs):.1f} байт на попытку")
+
+        start = time.perf_counter()
+        errors = replay.verify_runs(runs)
+        elapsed = time.perf_counter() - start
+        print(f"Повтор {len(runs)} попыток ({total_ticks} тиков): {elapsed:.2f} с "
+              f"({total_ticks / elapsed:.0f} тиков/с), не воспроизвелись: {len(errors)}")
+
+
+if __name__ == '__main__':
+    main()
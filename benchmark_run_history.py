@@ -0,0 +1,72 @@
+"""Запросы статистики попыток на синтетической истории в миллионы строк.
+
+Запуск: python benchmark_run_history.py [число строк] [число уровней].
+Работает с копией game.db во временном каталоге.
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import database
+from database import RunOutcome
+from migrations import run_migrations
+
+
+def generate_runs(count, levels, seed=0):
+    rnd = random.Random(seed)
+    for _ in range(count):
+        outcome = rnd.choices([RunOutcome.WIN, RunOutcome.FAIL, RunOutcome.ABANDONED], [3, 6, 1])[0]
+        ticks = rnd.randint(100, 10000)
+        yield (rnd.randint(1, levels), outcome, ticks / 50, rnd.randint(0, 10),
+               'MINE' if outcome == RunOutcome.FAIL and rnd.random() < 0.5 else None, ticks)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    levels = int(sys.argv[2]) if len(sys.argv) > 2 else 26
+    batch_size = 10000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'game.db')
+        shutil.copy('game.db', database.DB_PATH)
+
+        run_migrations()
+
+        start = time.perf_counter()
+        rows = generate_runs(count, levels)
+        while True:
+            batch = [row for _, row in zip(range(batch_size), rows)]
+            if not batch:
+                break
+            with database.transaction() as conn:
+                for row in batch:
+                    database.write_run(conn, *row)
+        elapsed = time.perf_counter() - start
+        print(f"Вставка {count} попыток пачками по {batch_size}: {elapsed:.1f} с ({count / elapsed:.0f} строк/с)")
+
+        database.get_connection().execute('ANALYZE')
+
+        timings = []
+        for level_id in range(1, levels + 1):
+            start = time.perf_counter()
+            stats = database.get_level_stats(level_id)
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        print(f"get_level_stats по {levels} уровням (~{count // levels} попыток на уровень): "
+              f"медиана {timings[len(timings) // 2] * 1000:.1f} мс, максимум {timings[-1] * 1000:.1f} мс")
+        print("Пример:", stats)
+
+        # Меню читает статистику из памяти репозитория, а из БД загружает только итоги всех уровней
+        start = time.perf_counter()
+        database.get_run_aggregates()
+        print(f"get_run_aggregates (итоги всех уровней при загрузке меню): {(time.perf_counter() - start) * 1000:.1f} мс")
+
+        database.close_connection()
+
+
+if __name__ == '__main__':
+    main()
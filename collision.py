@@ -0,0 +1,185 @@
+import itertools
+import re
+import pygame
+from bisect import bisect_left
+from collections import OrderedDict
+from operator import itemgetter
+
+
+MASK_RUNS_CACHE_SIZE = 256
+MERGED_MASK_CACHE_SIZE = 4
+# Для масок больше этого числа пикселей отрезки считаются по линиям при первом обращении
+LAZY_RUNS_MIN_AREA = 256 * 256
+
+_mask_runs_cache = OrderedDict()
+_merged_mask_cache = OrderedDict()
+
+
+def _find_runs(line: bytes):
+    return [(m.start(), m.end() - 1) for m in re.finditer(rb'\xff+', line)]
+
+
+class _LazyLineRuns:
+    """Отрезки по столбцам (vertical) или строкам большой маски; линия считается при первом обращении"""
+
+    def __init__(self, mask: pygame.mask.Mask, vertical: bool):
+        self.mask = mask
+        self.vertical = vertical
+        self.lines = {}
+
+    def __getitem__(self, index):
+        if index not in self.lines:
+            width, height = self.mask.get_size()
+            if self.vertical:
+                line = self.mask.to_surface(pygame.Surface((1, height)), dest=(-index, 0))
+            else:
+                line = self.mask.to_surface(pygame.Surface((width, 1)), dest=(0, -index))
+            self.lines[index] = _find_runs(pygame.image.tostring(line, 'RGB')[::3])
+
+        return self.lines[index]
+
+
+def mask_runs(mask: pygame.mask.Mask):
+    """Возвращает отрезки установленных битов маски по столбцам и по строкам.
+
+    Результат кэшируется: маски платформ, уровня и кадров игрока не меняются после создания.
+    """
+    key = id(mask)
+    if key in _mask_runs_cache:
+        _mask_runs_cache.move_to_end(key)
+        return _mask_runs_cache[key][1]
+
+    width, height = mask.get_size()
+    if width * height > LAZY_RUNS_MIN_AREA:
+        columns, rows = _LazyLineRuns(mask, True), _LazyLineRuns(mask, False)
+    else:
+        data = pygame.image.tostring(mask.to_surface(), 'RGB')[::3]
+        columns = [_find_runs(data[x::width]) for x in range(width)]
+        rows = [_find_runs(data[y * width:(y + 1) * width]) for y in range(height)]
+
+    # Храним саму маску, чтобы её id не был переиспользован, пока запись в кэше
+    _mask_runs_cache[key] = (mask, (columns, rows))
+    if len(_mask_runs_cache) > MASK_RUNS_CACHE_SIZE:
+        _mask_runs_cache.popitem(last=False)
+
+    return columns, rows
+
+
+def _blocked_shifts(runs_a, origin_a, runs_b, origin_b, lines, limit=None):
+    """Интервалы сдвигов s, при которых отрезки a, смещённые на -s, пересекают отрезки b.
+
+    С limit берутся только интервалы, пересекающие [-limit, limit]: отрезки b в каждой линии
+    упорядочены, поэтому дальние отрезки большой маски отсекаются бинарным поиском.
+    """
+    intervals = []
+    for line in lines:
+        line_b = runs_b[line - origin_b[0]]
+        for start_a, end_a in runs_a[line - origin_a[0]]:
+            offset = start_a + origin_a[1] - origin_b[1]
+            first = 0 if limit is None else bisect_left(line_b, offset - limit, key=itemgetter(1))
+            for start_b, end_b in itertools.islice(line_b, first, None):
+                if limit is not None and start_b > end_a + origin_a[1] - origin_b[1] + limit:
+                    break
+                intervals.append((offset - end_b, end_a + origin_a[1] - start_b - origin_b[1]))
+    return sorted(intervals)
+
+
+def _first_free_shift(intervals):
+    """Наименьший s >= 0, не попадающий ни в один из интервалов"""
+    shift = 0
+    for start, end in intervals:
+        if start > shift:
+            break
+        shift = max(shift, end + 1)
+    return shift
+
+
+def separating_shifts(sprite: pygame.sprite.Sprite, other: pygame.sprite.Sprite, limit=None):
+    """Минимальные сдвиги sprite вверх, вниз, влево и вправо, после которых маски не пересекаются.
+
+    Вместо перебора сдвигов с проверкой collide_mask для каждого столбца (строки) пересечения
+    прямоугольников считаются интервалы сдвигов, при которых отрезки масок накладываются,
+    и берётся первый сдвиг вне их объединения. Если задан limit, сдвиги не меньше limit
+    возвращаются как limit.
+    """
+    columns_a, rows_a = mask_runs(sprite.mask)
+    columns_b, rows_b = mask_runs(other.mask)
+    rect_a, rect_b = sprite.rect, other.rect
+
+    xs = range(max(rect_a.left, rect_b.left), min(rect_a.right, rect_b.right))
+    ys = range(max(rect_a.top, rect_b.top), min(rect_a.bottom, rect_b.bottom))
+
+    vertical = _blocked_shifts(columns_a, rect_a.topleft, columns_b, rect_b.topleft, xs, limit)
+    horizontal = _blocked_shifts(rows_a, (rect_a.top, rect_a.left), rows_b, (rect_b.top, rect_b.left), ys, limit)
+
+    # Порядок совпадает с Direction.directions(): вверх, вниз, влево, вправо
+    shifts = [
+        _first_free_shift(vertical),
+        _first_free_shift(sorted((-end, -start) for start, end in vertical)),
+        _first_free_shift(horizontal),
+        _first_free_shift(sorted((-end, -start) for start, end in horizontal)),
+    ]
+    return shifts if limit is None else [min(shift, limit) for shift in shifts]
+
+
+def first_contact(sprite: pygame.sprite.Sprite, other: pygame.sprite.Sprite, axis, distance):
+    """Сдвиг sprite по оси (0 — x, 1 — y) на 1..|distance| пикселей в сторону distance, на котором
+    маски впервые пересекаются, или None, если весь путь свободен.
+
+    Маска sprite заметается по пути одним Mask.convolve с отрезком, и путь проверяется одним пересечением.
+    Заметённые маски вложены друг в друга, поэтому первое касание находится бинарным поиском по длине пути.
+    """
+    step = 1 if distance > 0 else -1
+
+    def collides(length):
+        line = pygame.mask.Mask((length, 1) if axis == 0 else (1, length), fill=True)
+        swept = sprite.mask.convolve(line)
+        pos = list(sprite.rect.topleft)
+        pos[axis] += 1 if step > 0 else -length
+        return other.mask.overlap(swept, (pos[0] - other.rect.x, pos[1] - other.rect.y)) is not None
+
+    low, high = 1, abs(distance)
+    if not collides(high):
+        return None
+    while low < high:
+        middle = (low + high) // 2
+        if collides(middle):
+            high = middle
+        else:
+            low = middle + 1
+    return step * low
+
+
+class MergedMask(pygame.sprite.Sprite):
+    """Неподвижные спрайты, слитые в одну маску размером с их общий прямоугольник.
+
+    Проверка столкновения с любым из них — одно пересечение масок, сколько бы спрайтов ни было.
+    """
+
+    def __init__(self, sprites):
+        super().__init__()
+
+        rects = [sprite.rect for sprite in sprites]
+        self.rect = rects[0].unionall(rects[1:]) if rects else pygame.Rect(0, 0, 0, 0)
+        # Наибольший размер отдельной маски: выталкивание из слитой маски ограничивается им, как из одного спрайта
+        self.part_size = max((max(sprite.mask.get_size()) for sprite in sprites), default=0)
+        self.mask = pygame.mask.Mask(self.rect.size)
+        for sprite in sprites:
+            self.mask.draw(sprite.mask, (sprite.rect.x - self.rect.x, sprite.rect.y - self.rect.y))
+
+
+def merged_mask(sprites) -> MergedMask:
+    """MergedMask для спрайтов, общий для одинаковых наборов.
+
+    При перезапуске уровня платформы создаются заново, но их маски и положения те же, поэтому
+    слитая маска и уже посчитанные для неё отрезки переиспользуются.
+    """
+    key = tuple((sprite.mask, tuple(sprite.rect)) for sprite in sprites)
+    if key in _merged_mask_cache:
+        _merged_mask_cache.move_to_end(key)
+    else:
+        _merged_mask_cache[key] = MergedMask(sprites)
+        if len(_merged_mask_cache) > MERGED_MASK_CACHE_SIZE:
+            _merged_mask_cache.popitem(last=False)
+
+    return _merged_mask_cache[key]
@@ -2,6 +2,13 @@
 FULLSCREEN = False
 WINDOW_SIZE = (1920, 1080) if FULLSCREEN else (1600, 900)
 FPS = 50
+RENDER_FPS = 120  # ограничение частоты отрисовки, 0 — без ограничения (цикл занимает ядро целиком)
+
+# Параметры игрового цикла
+TICK_RATE = 50  # шагов симуляции в секунду, не зависит от частоты отрисовки
+MAX_TICKS_PER_FRAME = 5  # чтобы после долгого кадра не догонять симуляцию бесконечно
+INTERPOLATION = True  # интерполировать положение игрока между шагами симуляции
+DIRTY_RECTS = True  # выводить на экран только изменившиеся области, а не весь кадр
 BACKGROUND_COLOR = (64, 64, 64)
 
 # Цвета сложности
@@ -24,4 +31,22 @@ NOTIFICATION_DISPLAY_TIME = 2000
 GRAVITY = 0.5
 PLAYER_SPEED = 5
 LADDER_CLIMBING_SPEED = 2
-JUMP_STRENGTH = 6
\ No newline at end of file
+JUMP_STRENGTH = 6
+# Движение игрока за шаг одним запросом до первого касания, с дробными координатами.
+# Выключено: траектории отличаются от пошагового движения, под которое настроены уровни
+SWEPT_COLLISION = False
+
+# Каталог для запечённых ресурсов (создаётся автоматически)
+CACHE_DIR = 'cache'
+
+# Предельный объём общего кэша изображений спрайтов (в байтах)
+IMAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Сколько отрисованных строк хранит общий кэш текста
+TEXT_CACHE_SIZE = 512
+
+# Сколько карточек уровней хранит меню
+LEVEL_CARD_CACHE_SIZE = 128
+
+# Размер ячейки сетки для поиска столкновений (в пикселях)
+SPATIAL_HASH_CELL_SIZE = 128
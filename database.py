@@ -1,118 +1,294 @@
+import atexit
+import queue
 import sqlite3
+import threading
+import traceback
+from contextlib import contextmanager
 from typing import List, Dict, Optional
 
+DB_PATH = 'game.db'
+
+
+class RunOutcome:
+    WIN = 'WIN'
+    FAIL = 'FAIL'
+    ABANDONED = 'ABANDONED'
+
+_connection = None
+# Соединение общее на процесс, поэтому обращения из разных потоков выполняются по очереди
+_lock = threading.RLock()
+
+
 def get_connection():
-    return sqlite3.connect('game.db')
+    """Долгоживущее соединение с БД; настраивается один раз при первом обращении"""
+    global _connection
+    with _lock:
+        if _connection is None:
+            _connection = sqlite3.connect(DB_PATH, check_same_thread=False)
+            _connection.row_factory = sqlite3.Row
+            _connection.execute('PRAGMA journal_mode = WAL')
+            _connection.execute('PRAGMA synchronous = NORMAL')
+            _connection.execute('PRAGMA cache_size = -8000')
+            _connection.execute('PRAGMA temp_store = MEMORY')
+        return _connection
 
 
-def get_balance() -> int:
+def close_connection():
+    global _connection
+    with _lock:
+        if _connection is not None:
+            _connection.close()
+            _connection = None
+
+
+@contextmanager
+def locked():
+    """Общее соединение под блокировкой, без транзакции: для чтения и для кода, который сам управляет транзакциями"""
+    with _lock:
+        yield get_connection()
+
+
+@contextmanager
+def transaction():
+    """Выполняет блок в одной транзакции: фиксирует при успехе, откатывает при исключении"""
     conn = get_connection()
-    c = conn.cursor()
-    c.execute('SELECT balance FROM User WHERE id = 1')
-    balance = c.fetchone()[0]
-    conn.close()
-    return balance
+    with _lock, conn:
+        yield conn
+
+
+def get_balance() -> int:
+    with _lock:
+        return get_connection().execute('SELECT balance FROM User WHERE id = 1').fetchone()[0]
 
 
 def get_all_levels() -> List[Dict]:
-    conn = get_connection()
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    
-    c.execute('SELECT * FROM Level ORDER BY id')
-    levels = [dict(row) for row in c.fetchall()]
-    
-    conn.close()
-    return levels
+    with _lock:
+        return [dict(row) for row in get_connection().execute('SELECT * FROM Level ORDER BY id')]
 
 
-def level_win(level_id: int, 
-              coins_collected: Optional[int] = None, 
-              time_spent: Optional[float] = None):
-    conn = get_connection()
+def time_bucket(time_spent: float) -> int:
+    """Корзина гистограммы времени побед RunWinTime: целые секунды, как CAST(time_spent AS INTEGER)"""
+    return int(time_spent)
+
+
+def level_stats_from_aggregates(counts: Dict, histogram: Dict, percentiles=(0.5, 0.9)) -> Dict:
+    """Статистика уровня по числу попыток на исход и гистограмме времени побед {корзина: число побед}.
+
+    Перцентили — нижние границы корзин, то есть с точностью до секунды, как их и показывает меню.
+    """
+    attempts = sum(counts.values())
+    wins = counts.get(RunOutcome.WIN, 0)
+
+    times = dict.fromkeys(percentiles)
+    if wins:
+        ranks = sorted((min(int(p * wins), wins - 1), p) for p in percentiles)
+        seen = 0
+        for bucket in sorted(histogram):
+            seen += histogram[bucket]
+            while ranks and ranks[0][0] < seen:
+                times[ranks.pop(0)[1]] = float(bucket)
+            if not ranks:
+                break
+
+    return {
+        'attempts': attempts,
+        'wins': wins,
+        'win_rate': wins / attempts if attempts else None,
+        'percentiles': times,
+    }
+
+
+def get_run_aggregates():
+    """Итоги попыток всех уровней: ({level_id: {исход: число}}, {level_id: {корзина времени: число побед}})"""
+    counts, histograms = {}, {}
+    with _lock:
+        conn = get_connection()
+        for level_id, outcome, runs in conn.execute('SELECT level_id, outcome, runs FROM RunCount'):
+            counts.setdefault(level_id, {})[outcome] = runs
+        for level_id, bucket, wins in conn.execute('SELECT level_id, bucket, wins FROM RunWinTime'):
+            histograms.setdefault(level_id, {})[bucket] = wins
+    return counts, histograms
+
+
+def get_level_stats(level_id: int, percentiles=(0.5, 0.9)) -> Dict:
+    """Число попыток и побед на уровне и перцентили времени побед.
+
+    Читаются только итоги уровня из RunCount и RunWinTime, поэтому время не зависит от числа попыток.
+    """
+    with _lock:
+        conn = get_connection()
+        counts = dict(conn.execute('SELECT outcome, runs FROM RunCount WHERE level_id = ?', (level_id,)).fetchall())
+        histogram = dict(conn.execute('SELECT bucket, wins FROM RunWinTime WHERE level_id = ?', (level_id,)).fetchall())
+
+    return level_stats_from_aggregates(counts, histogram, percentiles)
+
+
+def get_recorded_runs(run_ids=None, level_id: Optional[int] = None) -> List[Dict]:
+    """Попытки с записанным вводом вместе с файлом уровня"""
+    query = ('SELECT Run.*, Level.map_filepath FROM Run JOIN Level ON Level.id = Run.level_id '
+             'WHERE Run.inputs IS NOT NULL')
+    params = []
+    if run_ids:
+        query += f' AND Run.id IN ({", ".join("?" * len(run_ids))})'
+        params += run_ids
+    if level_id is not None:
+        query += ' AND Run.level_id = ?'
+        params.append(level_id)
+
+    with _lock:
+        return [dict(row) for row in get_connection().execute(query + ' ORDER BY Run.id', params)]
+
+
+def write_run(conn, level_id: int, outcome: str, time_spent: float, coins_collected: int,
+              death_cause: Optional[str], ticks: int, inputs: Optional[bytes] = None):
+    conn.execute('''INSERT INTO Run (level_id, outcome, time_spent, coins_collected, death_cause, ticks, inputs)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                 (level_id, outcome, time_spent, coins_collected, death_cause, ticks, inputs))
+
+
+def get_ghost(level_id: int) -> Optional[bytes]:
+    """Траектория лучшей попытки уровня или None"""
+    with _lock:
+        row = get_connection().execute('SELECT trace FROM Ghost WHERE level_id = ?', (level_id,)).fetchone()
+    return row[0] if row else None
+
+
+def write_level_win(conn, level_id: int,
+                    coins_collected: Optional[int] = None,
+                    time_spent: Optional[float] = None,
+                    trace: Optional[bytes] = None):
     c = conn.cursor()
 
     # Разблокировка следующего уровня
     c.execute("UPDATE Level SET unlocked = 1 WHERE id = ? AND cost IS NULL", (level_id + 1,))
-    
-    update_fields = []
-    params = []
 
     c.execute('SELECT coins_collected, time_spent FROM Level WHERE id = ?', (level_id,))
     old_coins, old_time = c.fetchone()
     old_coins = old_coins if old_coins is not None else -1
     old_time = old_time if old_time is not None else 1e999
-    
+
+    # Монеты уровня и баланс меняются в одной транзакции, поэтому не могут разойтись
     if coins_collected is not None and coins_collected > old_coins:
-        update_fields.append('coins_collected = ?')
-        params.append(coins_collected)
+        c.execute('UPDATE Level SET coins_collected = ? WHERE id = ?', (coins_collected, level_id))
 
         # Update balance
-        c.execute('SELECT balance FROM User WHERE id = 1')
-        balance = c.fetchone()[0]
-        balance += coins_collected - old_coins
-        c.execute('UPDATE User SET balance = ? WHERE id = 1', (balance,))
-        
+        c.execute('UPDATE User SET balance = balance + ? WHERE id = 1', (coins_collected - old_coins,))
+
     if time_spent is not None and time_spent < old_time:
-        update_fields.append('time_spent = ?') 
-        params.append(time_spent)
-    
-    if update_fields:
-        query = f'UPDATE Level SET {", ".join(update_fields)} WHERE id = ?'
-        params.append(level_id)
-        c.execute(query, params)
-    
-    conn.commit()
-    conn.close()
+        c.execute('UPDATE Level SET time_spent = ? WHERE id = ?', (time_spent, level_id))
+        if trace is not None:
+            c.execute('INSERT OR REPLACE INTO Ghost (level_id, trace) VALUES (?, ?)', (level_id, trace))
+
+
+def write_balance(conn, balance: int):
+    conn.execute('UPDATE User SET balance = ? WHERE id = 1', (balance,))
+
+
+def write_reset_all(conn):
+    conn.execute('UPDATE User SET balance = 0 WHERE id = 1')
+    conn.execute('UPDATE Level SET unlocked = 0')
+    conn.execute('UPDATE Level SET unlocked = 1 WHERE id = 1')
+    conn.execute('UPDATE Level SET coins_collected = NULL, time_spent = NULL')
+    conn.execute('DELETE FROM Ghost')
+
+
+def write_unlock_level(conn, level_id: int):
+    conn.execute("UPDATE Level SET unlocked = 1 WHERE id = ?", (level_id,))
+
+
+def write_purchase_level(conn, level_id: int) -> bool:
+    # Получаем стоимость уровня и текущий баланс
+    cost = conn.execute("SELECT cost FROM Level WHERE id = ?", (level_id,)).fetchone()[0]
+    balance = conn.execute("SELECT balance FROM User WHERE id = 1").fetchone()[0]
+
+    if balance >= cost:
+        conn.execute("UPDATE User SET balance = balance - ? WHERE id = 1", (cost,))
+        conn.execute("UPDATE Level SET unlocked = 1 WHERE id = ?", (level_id,))
+        return True
+
+    return False
+
+
+def level_win(level_id: int,
+              coins_collected: Optional[int] = None,
+              time_spent: Optional[float] = None,
+              trace: Optional[bytes] = None):
+    with transaction() as conn:
+        write_level_win(conn, level_id, coins_collected, time_spent, trace)
 
 
 def set_balance(balance: int):
-    conn = get_connection()
-    c = conn.cursor()
-    
-    c.execute('UPDATE User SET balance = ? WHERE id = 1', (balance,))
-    
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        write_balance(conn, balance)
 
 
 def reset_all():
-    conn = get_connection()
-    c = conn.cursor()
-    
-    c.execute('UPDATE User SET balance = 0 WHERE id = 1')
-    c.execute('UPDATE Level SET unlocked = 0')
-    c.execute('UPDATE Level SET unlocked = 1 WHERE id = 1')
-    c.execute('UPDATE Level SET coins_collected = NULL, time_spent = NULL')
-    
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        write_reset_all(conn)
 
 
 def unlock_level(level_id: int):
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("UPDATE Level SET unlocked = 1 WHERE id = ?", (level_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        write_unlock_level(conn, level_id)
 
 def purchase_level(level_id: int) -> bool:
     """Пытается купить бонусный уровень. Возвращает True при успехе"""
-    conn = get_connection()
-    c = conn.cursor()
-    
-    # Получаем стоимость уровня и текущий баланс
-    c.execute("SELECT cost FROM Level WHERE id = ?", (level_id,))
-    cost = c.fetchone()[0]
-    c.execute("SELECT balance FROM User WHERE id = 1")
-    balance = c.fetchone()[0]
-    
-    if balance >= cost:
-        c.execute("UPDATE User SET balance = balance - ? WHERE id = 1", (cost,))
-        c.execute("UPDATE Level SET unlocked = 1 WHERE id = ?", (level_id,))
-        conn.commit()
-        conn.close()
-        return True
-    
-    conn.close()
-    return False
\ No newline at end of file
+    with transaction() as conn:
+        return write_purchase_level(conn, level_id)
+
+
+class WriteBehindQueue:
+    """Очередь записей в БД, которые выполняет фоновый поток.
+
+    Операция — функция вида write_*(conn, *args). Всё, что накопилось в очереди к моменту
+    записи, выполняется одной транзакцией. Если транзакция не удалась, операции повторяются
+    по одной, чтобы ошибка в одной не потеряла остальные. При выходе из процесса очередь дописывается.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def submit(self, operation, *args):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='db-writer', daemon=True)
+            self.thread.start()
+            atexit.register(self.flush)
+
+        self.queue.put((operation, args))
+
+    def flush(self):
+        """Ждёт, пока все поставленные в очередь записи попадут в БД"""
+        self.queue.join()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    @staticmethod
+    def write(batch):
+        try:
+            with transaction() as conn:
+                for operation, args in batch:
+                    operation(conn, *args)
+        except Exception:
+            if len(batch) == 1:
+                traceback.print_exc()
+                return
+
+            for item in batch:
+                WriteBehindQueue.write([item])
+
+
+write_queue = WriteBehindQueue()
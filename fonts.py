@@ -0,0 +1,42 @@
+import pygame
+from collections import OrderedDict
+from functools import lru_cache
+
+from config import TEXT_CACHE_SIZE
+
+
+@lru_cache(maxsize=None)
+def get_font(filename, size) -> pygame.font.Font:
+    """Шрифт загружается один раз на процесс"""
+    return pygame.font.Font(filename, size)
+
+
+class TextCache:
+    """Общий кэш отрисованных строк с вытеснением давно не использованных.
+
+    Ключ — (шрифт, строка, цвет, сглаживание). Поверхности разделяются между вызовами,
+    поэтому изменять их на месте нельзя.
+    """
+
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def render(self, font, text, antialias, color) -> pygame.Surface:
+        key = (font, text, tuple(color), antialias)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        surface = font.render(text, antialias, color)
+        self.entries[key] = surface
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+
+text_cache = TextCache()
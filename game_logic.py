@@ -1,39 +1,62 @@
 # -*- coding: utf-8 -*-
 import pygame
-import json
 from scene import Scene
-from config import BACKGROUND_COLOR, WINDOW_SIZE
+from config import WINDOW_SIZE, TICK_RATE
 from level import Level, Status
-from player import Direction
+from level_format import load_level_data
+from simulation import apply_key_event, apply_held_keys, encode_inputs, RECORDED_KEYS, KEY_DIRECTIONS
 from sounds import SoundManager
-from sprites import load_image
-from database import level_win
+from sprites import image_cache
+from hud import HudButton, load_icon
+from fonts import get_font, text_cache
+from repository import repository
+from database import RunOutcome
+from ghost import Ghost, TraceWriter
 
 class Game(Scene):
     def __init__(self, game_manager, level):
         super().__init__()
 
-        self.font = pygame.font.Font(None, 36)
+        self.font = get_font(None, 36)
         self.sound_manager = SoundManager()
         self.game_manager = game_manager
 
-        with open(level['map_filepath']) as f:
-            self.level_data = json.load(f)
+        self.level_data = load_level_data(level['map_filepath'])
 
         self.level_id = level['id']
-        self.bg_image = load_image('background.png')
-        self.pause_btn_rect = None
-        self.restart_btn_rect = None
-        self.menu_btn_rect = None
+        self.bg_image, _ = image_cache.get('background.png')
+
+        self.pause_icon = load_icon('pause.png')
+        self.play_icon = load_icon('unpause.png')
+        self.menu_button = HudButton(load_icon('back.png'), "В меню", self.font, border_radius=4, alpha=150)
+        self.pause_button = HudButton(self.pause_icon)
+        self.restart_button = HudButton(load_icon('restart.png'))
+        self.layout_hud()
+
         self.reset()
         
     def reset(self):
         self.level = Level(self.level_id, self.level_data)
+        self.level.set_background(self.bg_image)
+        self.drawn_rects = []
+        self.invalidate()
         self.game_over = False
         self.messagebox = None
-        self.start_time = pygame.time.get_ticks()
+        self.ticks = 0
         self.paused = False
+        self.pause_button.set_icon(self.pause_icon)
+        self.layout_hud()
         self.elapsed_time = 0
+        # Ввод попытки (tick, event_type, key), сохраняется вместе с результатом
+        self.inputs = []
+        self.pressed = set()
+        self.sync_held_keys()
+
+        # Траектория этой попытки и призрак лучшей
+        self.trace = TraceWriter()
+        self.trace.append(self.level.player)
+        best_trace = repository.get_ghost(self.level_id)
+        self.ghost = Ghost(best_trace) if best_trace else None
 
     def handle_event(self, event):
         if self.game_over:
@@ -46,42 +69,46 @@ class Game(Scene):
             return
         
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            if self.menu_btn_rect.collidepoint(event.pos):
+            if self.menu_button.rect.collidepoint(event.pos):
+                self.record_run(RunOutcome.ABANDONED)
                 self.sound_manager.stop()
                 self.game_manager.return_to_menu()
-            elif self.pause_btn_rect.collidepoint(event.pos):
+            elif self.pause_button.rect.collidepoint(event.pos):
                 self.toggle_pause()
-            elif self.restart_btn_rect.collidepoint(event.pos):
+            elif self.restart_button.rect.collidepoint(event.pos):
+                self.record_run(RunOutcome.ABANDONED)
                 self.reset()
 
         if event.type == pygame.QUIT:
+            self.record_run(RunOutcome.ABANDONED)
             pygame.quit()
             exit()
 
         if self.paused:
             return
             
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_LEFT:
-                self.level.player.go(Direction.LEFT)
-            elif event.key == pygame.K_RIGHT:
-                self.level.player.go(Direction.RIGHT)
-            elif event.key == pygame.K_DOWN:
-                self.level.player.go(Direction.DOWN)
-            elif event.key == pygame.K_UP:
-                self.level.player.go(Direction.UP)
-            elif event.key == pygame.K_SPACE:
-                self.level.player.jump(self.level.platforms)
-                
-        elif event.type == pygame.KEYUP:
-            if event.key == pygame.K_LEFT:
-                self.level.player.stop(Direction.LEFT)
-            elif event.key == pygame.K_RIGHT:
-                self.level.player.stop(Direction.RIGHT)
-            elif event.key == pygame.K_UP:
-                self.level.player.stop(Direction.UP)
-            elif event.key == pygame.K_DOWN:
-                self.level.player.stop(Direction.DOWN)
+        if event.type in (pygame.KEYDOWN, pygame.KEYUP):
+            self.key_event(event.type, event.key)
+
+    def key_event(self, event_type, key):
+        if key in RECORDED_KEYS:
+            self.inputs.append((self.ticks, event_type, key))
+            if event_type == pygame.KEYDOWN:
+                self.pressed.add(key)
+            else:
+                self.pressed.discard(key)
+        apply_key_event(self.level, event_type, key)
+
+    def sync_held_keys(self):
+        """Передаёт как события нажатия и отпускания стрелок, пропущенные на паузе или до перезапуска.
+
+        Они записываются во ввод, поэтому повтор попытки видит то же. Пробел не синхронизируется:
+        это прыжок, а не удерживаемое состояние.
+        """
+        keyboard = pygame.key.get_pressed()
+        for key in KEY_DIRECTIONS:
+            if keyboard[key] != (key in self.pressed):
+                self.key_event(pygame.KEYDOWN if keyboard[key] else pygame.KEYUP, key)
 
     def update(self):
         if self.paused:
@@ -92,13 +119,15 @@ class Game(Scene):
         if self.game_over:
             return
         
-        self.elapsed_time = (pygame.time.get_ticks() - self.start_time) / 1000  # time inc
+        # Время уровня считается по шагам симуляции, а не по часам, поэтому не зависит от машины
+        self.ticks += 1
+        self.elapsed_time = self.ticks / TICK_RATE
+        self.trace.append(self.level.player)
+        if self.ghost:
+            self.ghost.update()
         
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_UP]:
-            self.level.player.go(Direction.UP)
-        if keys[pygame.K_DOWN]:
-            self.level.player.go(Direction.DOWN)
+        # Удерживаемые клавиши берутся из записанного ввода, а не с клавиатуры, чтобы попытку можно было повторить
+        apply_held_keys(self.level, self.pressed.__contains__)
         
         status = self.level.get_status()
         if status == Status.FAILED:
@@ -108,21 +137,34 @@ class Game(Scene):
 
         self.sound_manager.play_random_music()
 
-    def draw(self, screen):
-        screen.fill(BACKGROUND_COLOR)
-        screen.blit(self.bg_image, (0, 0))
-        self.level.draw(screen)
-        
-        self.draw_ui(screen)
+    def draw(self, screen, alpha=1.0):
+        # Полный кадр рисуется поверх статического слоя, иначе восстанавливается только то, что рисовалось в прошлом
+        if self.dirty_rects is None:
+            screen.blit(self.level.get_static_layer(screen.get_size()), (0, 0))
+        else:
+            self.level.restore_background(screen, self.drawn_rects)
+
+        rects = []
+        # После конца попытки призрак не двигается, и на экране победы или поражения он не нужен
+        if self.ghost and not self.ghost.finished and not self.game_over:
+            rects.append(self.ghost.draw(screen, alpha))
+        rects += self.level.draw_dynamic(screen, alpha)
+        rects += self.draw_ui(screen)
         
         if self.game_over or self.paused:
-            self.messagebox.draw(screen)
+            rects.append(self.messagebox.draw(screen))
 
-    def draw_ui(self, screen):
+        self.mark_dirty(*self.drawn_rects, *rects)
+        self.drawn_rects = rects
+
+    def layout_hud(self, padding=20):
+        self.menu_button.place(topleft=(padding, padding))
+        self.pause_button.place(topright=(WINDOW_SIZE[0] - padding, padding))
+        self.restart_button.place(topright=(self.pause_button.rect.left - padding, padding))
+
+    def draw_ui(self, screen) -> list[pygame.Rect]:
         # Кнопки
-        self.draw_menu_button(screen)
-        self.draw_pause_button(screen)
-        self.draw_restart_button(screen)
+        rects = [button.draw(screen) for button in (self.menu_button, self.pause_button, self.restart_button)]
 
         # Статистика
         coins_text = f"Монет собрано: {self.level.coins_collected()} "
@@ -130,74 +172,28 @@ class Game(Scene):
         
         # Отрисовка монет
         coin_pos = (WINDOW_SIZE[0]//20 * 6, 20)
-        screen.blit(self.font.render(coins_text, True, (255,255,255)), 
-                   (coin_pos[0], coin_pos[1]))
+        rects.append(screen.blit(text_cache.render(self.font, coins_text, True, (255,255,255)), coin_pos))
         
         # Отрисовка времени
         time_pos = (WINDOW_SIZE[0]//20 * 11, 20)
-        screen.blit(self.font.render(time_text, True, (255,255,255)), time_pos)
+        rects.append(screen.blit(text_cache.render(self.font, time_text, True, (255,255,255)), time_pos))
 
-    def draw_menu_button(self, screen, padding=20):
-        menu_icon = pygame.image.load('assets/icons/back.png').convert_alpha()
-        
-        menu_text = self.font.render("В меню", True, (255, 255, 255))
-        
-        icon_spacing = 10
-        btn_width = menu_icon.get_width() + menu_text.get_width() + icon_spacing + 30
-        btn_height = max(menu_icon.get_height(), menu_text.get_height()) + 20
-        btn_topleft = (padding, padding)
-        
-        surface = pygame.Surface((btn_width, btn_height), pygame.SRCALPHA)
-        pygame.draw.rect(surface, (140, 140, 140), (0, 0, btn_width, btn_height), border_radius=4)
-        
-        icon_y = btn_height//2 - menu_icon.get_height()//2
-        text_y = btn_height//2 - menu_text.get_height()//2
-        
-        surface.blit(menu_icon, (15, icon_y))
-        surface.blit(menu_text, (15 + menu_icon.get_width() + icon_spacing, text_y))
+        return rects
 
-        surface.set_alpha(150)
-        self.menu_btn_rect = surface.get_rect(topleft=btn_topleft)
-        screen.blit(surface, btn_topleft)
-
-    def draw_pause_button(self, screen, padding=20):
-        pause_icon = pygame.image.load('assets/icons/pause.png').convert_alpha()
-        play_icon = pygame.image.load('assets/icons/unpause.png').convert_alpha()
-        current_icon = play_icon if self.paused else pause_icon
-        
-        btn_width = current_icon.get_width() + 30
-        btn_height = current_icon.get_height() + 20
-        btn_topleft = (WINDOW_SIZE[0] - btn_width - padding, padding)
-
-        surface = pygame.Surface((btn_width, btn_height), pygame.SRCALPHA)
-        pygame.draw.rect(surface, (140, 140, 140), (0, 0, btn_width, btn_height), border_radius=3)
-
-        surface.blit(current_icon, (15, btn_height//2 - current_icon.get_height()//2))
-        
-        surface.set_alpha(128)
-        self.pause_btn_rect = surface.get_rect(topleft=btn_topleft)
-        screen.blit(surface, btn_topleft)
-
-    def draw_restart_button(self, screen, padding = 20):
-        restart_icon = pygame.image.load('assets/icons/restart.png').convert_alpha()
-        
-        btn_width = restart_icon.get_width() + 30
-        btn_height = restart_icon.get_height() + 20
-        btn_topleft = (self.pause_btn_rect.left - btn_width - padding, padding)
-
-        surface = pygame.Surface((btn_width, btn_height), pygame.SRCALPHA)
-        pygame.draw.rect(surface, (140, 140, 140), (0, 0, btn_width, btn_height), border_radius=3)
+    def record_run(self, outcome):
+        # Попытка, которую бросили, не сделав ни шага, не считается
+        if outcome == RunOutcome.ABANDONED and not self.ticks:
+            return
 
-        surface.blit(restart_icon, (15, btn_height//2 - restart_icon.get_height()//2))
-        
-        surface.set_alpha(128)
-        self.restart_btn_rect = surface.get_rect(topleft=btn_topleft)
-        screen.blit(surface, btn_topleft)
+        repository.record_run(self.level_id, outcome, self.elapsed_time, self.level.coins_collected(),
+                              self.level.fail_cause, self.ticks, encode_inputs(self.inputs))
 
     def win(self):
-        level_win(self.level_id, 
-                  coins_collected=self.level.coins_collected(),
-                  time_spent=self.elapsed_time)
+        repository.level_win(self.level_id, 
+                             coins_collected=self.level.coins_collected(),
+                             time_spent=self.elapsed_time,
+                             trace=self.trace.getvalue())
+        self.record_run(RunOutcome.WIN)
         self.messagebox = InfoBox(
             (WINDOW_SIZE[0] // 2, WINDOW_SIZE[1] // 2),
             "Победа! Нажмите чтобы вернуться в меню",
@@ -207,6 +203,7 @@ class Game(Scene):
         self.game_over = True
         
     def lose(self):
+        self.record_run(RunOutcome.FAIL)
         self.game_over = True
         self.messagebox = InfoBox(
             (WINDOW_SIZE[0]//2, WINDOW_SIZE[1]//2),
@@ -217,16 +214,21 @@ class Game(Scene):
 
     def toggle_pause(self):
         self.paused = not self.paused
-        if self.paused:
-            self.pause_time = pygame.time.get_ticks()
+        self.pause_button.set_icon(self.play_icon if self.paused else self.pause_icon)
+        self.layout_hud()
+        if not self.paused:
+            self.sync_held_keys()
+        else:
+            # Пока шаги не идут, игрок и призрак не должны двигаться между prev_pos и rect вслед за alpha
+            self.level.player.freeze()
+            if self.ghost:
+                self.ghost.freeze()
             self.messagebox = InfoBox(
                 (WINDOW_SIZE[0]//2, WINDOW_SIZE[1]//2),
                 "Игра на паузе!",
                 (300, 100),
                 bg_color=(150, 150, 150)
             )
-        else:
-            self.start_time += pygame.time.get_ticks() - self.pause_time
 
 class InfoBox:
     def __init__(self, center_pos, text, size, bg_color=(80, 80, 80), text_color=(255, 255, 255)):
@@ -237,10 +239,9 @@ class InfoBox:
         pygame.draw.rect(self.surface, (*bg_color, 200), (0, 0, *size), border_radius=15)
         
         # Текст
-        font = pygame.font.Font(None, 32)
-        text_surf = font.render(text, True, text_color)
+        text_surf = text_cache.render(get_font(None, 32), text, True, text_color)
         text_rect = text_surf.get_rect(center=(size[0]//2, size[1]//2))
         self.surface.blit(text_surf, text_rect)
 
     def draw(self, screen):
-        screen.blit(self.surface, self.rect)
\ No newline at end of file
+        return screen.blit(self.surface, self.rect)
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""Призрак лучшей попытки: траектория игрока по тикам и её воспроизведение.
+
+Траектория — байт версии, затем на каждый тик, начиная с нулевого, запись из двух беззнаковых
+varint-чисел: изменение x (zigzag) со сдвигом на 2 бита и кадром анимации в младших битах,
+затем изменение y (zigzag). Положение квантовано до пикселя: пишется rect игрока, а не дробные
+координаты. Обычно тик занимает два байта.
+"""
+from typing import Optional
+
+from player import Player, Direction
+from varint import write_varint, read_varint
+
+TRACE_FORMAT_VERSION = 1
+
+
+def _zigzag(value):
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def frame_code(player: Player):
+    """Кадр анимации игрока числом 0..3: направление и номер кадра бега"""
+    return (player.rotation == Direction.LEFT) * 2 + player.sprite_num // Player.FRAME_RATE_COEF
+
+
+class TraceWriter:
+    """Накапливает траекторию попытки, по записи на тик"""
+
+    def __init__(self):
+        self.data = bytearray([TRACE_FORMAT_VERSION])
+        self.x = self.y = 0
+
+    def append(self, player: Player):
+        x, y = player.rect.topleft
+        write_varint(self.data, _zigzag(x - self.x) << 2 | frame_code(player))
+        write_varint(self.data, _zigzag(y - self.y))
+        self.x, self.y = x, y
+
+    def getvalue(self) -> bytes:
+        return bytes(self.data)
+
+
+class TraceReader:
+    """Читает траекторию по одной записи за вызов, не разворачивая её целиком"""
+
+    def __init__(self, data: bytes):
+        if not data or data[0] != TRACE_FORMAT_VERSION:
+            raise ValueError(f'Unsupported trace format {data[:1]!r}')
+
+        self.data = data
+        self.offset = 1
+        self.x = self.y = 0
+
+    def next(self) -> Optional[tuple[int, int, int]]:
+        """(x, y, кадр) следующего тика или None, если траектория закончилась"""
+        if self.offset >= len(self.data):
+            return None
+
+        value, self.offset = read_varint(self.data, self.offset)
+        dy, self.offset = read_varint(self.data, self.offset)
+        self.x += _unzigzag(value >> 2)
+        self.y += _unzigzag(dy)
+        return self.x, self.y, value & 3
+
+
+class Ghost(Player):
+    """Полупрозрачный игрок, который повторяет записанную траекторию по тику за update()"""
+    ALPHA = 100
+
+    # Свои кадры: кадры игрока общие с кэшем изображений, и прозрачность задаётся их копиям
+    _frame_table = None
+
+    def __init__(self, trace: bytes, **kwargs):
+        self.reader = TraceReader(trace)
+        self.finished = False
+        super().__init__((0, 0), **kwargs)
+        self.update()
+        self.prev_pos = self.rect.topleft
+
+    @classmethod
+    def get_frame_table(cls):
+        if cls._frame_table is None:
+            cls._frame_table = {}
+            for name, frames in Player.get_frame_table().items():
+                cls._frame_table[name] = {
+                    direction: [(cls.make_translucent(image), mask) for image, mask in direction_frames]
+                    for direction, direction_frames in frames.items()
+                }
+
+        return cls._frame_table
+
+    @classmethod
+    def make_translucent(cls, image):
+        image = image.copy()
+        image.set_alpha(cls.ALPHA)
+        return image
+
+    def update(self):
+        self.prev_pos = self.rect.topleft
+
+        record = self.reader.next()
+        if record is None:
+            self.finished = True
+            return
+
+        x, y, frame = record
+        self.rotation = Direction.LEFT if frame & 2 else Direction.RIGHT
+        self.sprite_num = (frame & 1) * self.FRAME_RATE_COEF
+        self.set_frame()
+        self.rect.topleft = (x, y)
@@ -0,0 +1,100 @@
+import os
+
+# Окно не нужно: SDL должен выбрать фиктивные драйверы до инициализации pygame
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import json
+import time
+import pygame
+from pathlib import Path
+
+from level import Status
+from level_format import load_level_data
+from populate_levels import get_level_files
+from simulation import LevelSimulation
+
+
+STATUS_NAMES = {
+    Status.IN_PROGRESS: 'IN_PROGRESS',
+    Status.FAILED: 'FAILED',
+    Status.FINISHED: 'FINISHED',
+}
+
+EVENT_TYPES = {'down': pygame.KEYDOWN, 'up': pygame.KEYUP}
+
+
+def init_dummy_display():
+    """Фиктивное окно 1×1. Изображения тогда переводятся в формат экрана, как в игре, и повороты
+    и маски спрайтов совпадают с игровыми. Подходит как initializer для пула процессов
+    """
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+
+
+def load_inputs(filename):
+    """Читает сценарий ввода: список [tick, "down"|"up", имя клавиши], например [0, "down", "right"]"""
+    with open(filename) as f:
+        return parse_inputs(json.load(f))
+
+
+def parse_inputs(script):
+    return sorted(
+        ((tick, EVENT_TYPES[event], pygame.key.key_code(key)) for tick, event, key in script),
+        key=lambda x: x[0]
+    )
+
+
+def format_inputs(inputs):
+    """Обратное к parse_inputs: сценарий ввода для --inputs"""
+    event_names = {event_type: name for name, event_type in EVENT_TYPES.items()}
+    return [[tick, event_names[event_type], pygame.key.name(key)] for tick, event_type, key in inputs]
+
+
+def run_level(level_id, level_data, inputs=(), max_ticks=60000):
+    """Прогоняет уровень без окна с максимальной скоростью и возвращает итоги"""
+    simulation = LevelSimulation(level_id, level_data, inputs)
+    status = simulation.run(max_ticks)
+
+    return {
+        'level_id': level_id,
+        'status': STATUS_NAMES[status],
+        'ticks': simulation.ticks,
+        'time_spent': simulation.elapsed_time,
+        'coins_collected': simulation.level.coins_collected(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Прогон уровней без окна')
+    parser.add_argument('levels', nargs='*', help='файлы уровней (по умолчанию все levels/level_*.json)')
+    parser.add_argument('--inputs', help='JSON-файл со сценарием ввода')
+    parser.add_argument('--max-ticks', type=int, default=60000)
+    args = parser.parse_args()
+
+    pygame.init()
+
+    inputs = load_inputs(args.inputs) if args.inputs else []
+    files = args.levels or get_level_files()
+
+    total_ticks = 0
+    total_start = time.perf_counter()
+    for file in files:
+        level_data = load_level_data(file)
+
+        start = time.perf_counter()
+        result = run_level(int(Path(file).stem.split('_')[-1]), level_data, inputs, args.max_ticks)
+        elapsed = time.perf_counter() - start
+        total_ticks += result['ticks']
+
+        print(f"{file}: {result['status']}, тиков: {result['ticks']}, время: {result['time_spent']:.2f}, "
+              f"монет: {result['coins_collected']}, {result['ticks'] / elapsed:.0f} тиков/с")
+
+    total_elapsed = time.perf_counter() - total_start
+    print(f"Всего тиков: {total_ticks} за {total_elapsed:.2f} с ({total_ticks / total_elapsed:.0f} тиков/с)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import pygame
+
+
+def load_icon(filename):
+    return pygame.image.load(f'assets/icons/{filename}').convert_alpha()
+
+
+class HudButton:
+    """Полупрозрачная кнопка интерфейса с иконкой и необязательной подписью.
+
+    Поверхность собирается один раз и пересобирается только при смене иконки или подписи.
+    """
+    ICON_SPACING = 10
+
+    def __init__(self, icon, text=None, font=None, border_radius=3, alpha=128,
+                 bg_color=(140, 140, 140), text_color=(255, 255, 255)):
+        self.icon = icon
+        self.text = text
+        self.font = font
+        self.border_radius = border_radius
+        self.alpha = alpha
+        self.bg_color = bg_color
+        self.text_color = text_color
+
+        self.surface = None
+        self.rect = None
+        self.anchor = {'topleft': (0, 0)}
+        self.render()
+
+    def render(self):
+        text_surf = self.font.render(self.text, True, self.text_color) if self.text else None
+
+        width = self.icon.get_width() + 30
+        height = self.icon.get_height() + 20
+        if text_surf:
+            width += text_surf.get_width() + self.ICON_SPACING
+            height = max(self.icon.get_height(), text_surf.get_height()) + 20
+
+        self.surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        pygame.draw.rect(self.surface, self.bg_color, (0, 0, width, height), border_radius=self.border_radius)
+
+        self.surface.blit(self.icon, (15, height//2 - self.icon.get_height()//2))
+        if text_surf:
+            self.surface.blit(text_surf, (15 + self.icon.get_width() + self.ICON_SPACING,
+                                          height//2 - text_surf.get_height()//2))
+
+        self.surface.set_alpha(self.alpha)
+        self.rect = self.surface.get_rect(**self.anchor)
+
+    def set_icon(self, icon):
+        if icon is not self.icon:
+            self.icon = icon
+            self.render()
+
+    def place(self, **kwargs):
+        """Задаёт положение кнопки, например place(topright=(x, y)); сохраняется при пересборке"""
+        self.anchor = kwargs
+        self.rect = self.surface.get_rect(**kwargs)
+
+    def draw(self, screen) -> pygame.Rect:
+        return screen.blit(self.surface, self.rect)
@@ -2,7 +2,9 @@ import pygame
 
 import sprites
 from player import Player
-from config import WINDOW_SIZE
+from spatial_hash import SpatialHashGroup
+from collision import merged_mask
+from config import WINDOW_SIZE, BACKGROUND_COLOR
 
 
 class Status:
@@ -11,43 +13,98 @@ class Status:
     FINISHED = 3
 
 
+class FailCause:
+    FELL = 'FELL'
+    MINE = 'MINE'
+
+
 class Level:
     def __init__(self, level_id, level_data):
         self.id = level_id
 
-        self.platforms = pygame.sprite.Group([sprites.Platform.from_dict(d) for d in level_data['map']['platforms']])
-        self.ladders = pygame.sprite.Group([sprites.Ladder.from_dict(d) for d in level_data['map']['ladders']])
-        self.mines = pygame.sprite.Group([sprites.Mine.from_dict(d) for d in level_data['map']['mines']])
-        self.coins = pygame.sprite.Group([sprites.Coin.from_dict(d) for d in level_data['map']['coins']])
+        # level_data — словарь из JSON или level_format.BinaryLevel
+        if isinstance(level_data, dict):
+            self.platforms = SpatialHashGroup([sprites.Platform.from_dict(d) for d in level_data['map']['platforms']])
+            self.ladders = SpatialHashGroup([sprites.Ladder.from_dict(d) for d in level_data['map']['ladders']])
+            self.mines = SpatialHashGroup([sprites.Mine.from_dict(d) for d in level_data['map']['mines']])
+            self.coins = SpatialHashGroup([sprites.Coin.from_dict(d) for d in level_data['map']['coins']])
 
-        self.start = sprites.Start(level_data['map']['start'])
-        self.finish = sprites.Finish(level_data['map']['finish'])
+            self.start = sprites.Start(level_data['map']['start'])
+            self.finish = sprites.Finish(level_data['map']['finish'])
+        else:
+            self.platforms = SpatialHashGroup(level_data.platforms())
+            self.ladders = SpatialHashGroup(level_data.ladders())
+            self.mines = SpatialHashGroup(level_data.mines())
+            self.coins = SpatialHashGroup(level_data.coins())
+
+            self.start = sprites.Start(level_data.start)
+            self.finish = sprites.Finish(level_data.finish)
         self.player = Player(self.start.get_pos())
 
+        # Платформы не двигаются, поэтому для столкновений игрока они сливаются в одну маску
+        self.solid = merged_mask(self.platforms.sprites())
+
         self.max_coins = len(self.coins)
         self.status = Status.IN_PROGRESS
+        self.fail_cause = None
+
+        self.background = None
+        self.static_layer = None
         
     def update(self):
         self.mines.update()
 
         if self.status == Status.IN_PROGRESS:
-            self.player.update(self.platforms, self.ladders, self.mines, self.coins)
+            self.player.update(self.solid, self.ladders, self.mines, self.coins)
 
             if self.check_finish():
                 self.status = Status.FINISHED
             elif self.check_fail():
                 self.status = Status.FAILED
 
-    def draw(self, screen):
-        self.platforms.draw(screen)
-        self.ladders.draw(screen)
-        self.coins.draw(screen)
-        self.start.draw(screen)
-        self.finish.draw(screen)
-        self.mines.draw(screen)
+    def set_background(self, image):
+        self.background = image
+        self.invalidate_static_layer()
+
+    def invalidate_static_layer(self):
+        self.static_layer = None
+
+    def get_static_layer(self, size):
+        """Фон и неподвижные объекты уровня, собранные в одну поверхность"""
+        if self.static_layer is None or self.static_layer.get_size() != size:
+            self.static_layer = pygame.Surface(size)
+            if pygame.display.get_surface() is not None:
+                self.static_layer = self.static_layer.convert()
+
+            self.static_layer.fill(BACKGROUND_COLOR)
+            if self.background:
+                self.static_layer.blit(self.background, (0, 0))
+
+            self.platforms.draw(self.static_layer)
+            self.ladders.draw(self.static_layer)
+            self.start.draw(self.static_layer)
+            self.finish.draw(self.static_layer)
+
+        return self.static_layer
+
+    def draw(self, screen, alpha=1.0):
+        screen.blit(self.get_static_layer(screen.get_size()), (0, 0))
+        self.draw_dynamic(screen, alpha)
+
+    def draw_dynamic(self, screen, alpha=1.0) -> list[pygame.Rect]:
+        """Рисует подвижные объекты и возвращает занятые ими области"""
+        rects = [screen.blit(sprite.image, sprite.rect) for sprite in self.coins]
+        rects += [screen.blit(sprite.image, sprite.rect) for sprite in self.mines]
 
         if self.status == Status.IN_PROGRESS:
-            self.player.draw(screen)
+            rects.append(self.player.draw(screen, alpha))
+
+        return rects
+
+    def restore_background(self, screen, rects):
+        static_layer = self.get_static_layer(screen.get_size())
+        for rect in rects:
+            screen.blit(static_layer, rect, rect)
 
     def get_status(self):
         return self.status
@@ -56,8 +113,12 @@ class Level:
         return pygame.sprite.collide_mask(self.player, self.finish)
     
     def check_fail(self):
-        return self.player.rect.bottom > WINDOW_SIZE[1] * 2 or \
-            any(map(lambda x: x.is_exploding(), self.mines))
+        if self.player.rect.bottom > WINDOW_SIZE[1] * 2:
+            self.fail_cause = FailCause.FELL
+        elif any(map(lambda x: x.is_exploding(), self.mines)):
+            self.fail_cause = FailCause.MINE
+
+        return self.fail_cause is not None
     
     def coins_collected(self):
         return self.max_coins - len(self.coins)
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""Компактный двоичный формат уровней.
+
+Файл состоит из заголовка и четырёх секций записей фиксированной длины: платформы, лестницы,
+мины, монеты. Все числа little-endian. Секции читаются прямо из отображённого в память файла
+через struct.iter_unpack, поэтому спрайты уровня создаются без промежуточных словарей.
+
+Двоичные копии JSON-уровней хранятся в CACHE_DIR/levels и пересобираются, если JSON изменился.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+
+import sprites
+from config import CACHE_DIR
+from sprites import Size
+
+MAGIC = b'PLVL'
+VERSION = 1
+
+# magic, версия, mtime_ns и размер исходного JSON, старт (x, y), финиш (x, y), число записей в секциях
+HEADER = struct.Struct('<4sHqQhhhhHHHH')
+# id, x, y, размер, угол
+PLATFORM = struct.Struct('<IhhBxf')
+# id, x, y, размер
+LADDER = struct.Struct('<IhhBx')
+# id, x, y
+POINT = struct.Struct('<Ihh')
+
+SECTIONS = (('platforms', PLATFORM), ('ladders', LADDER), ('mines', POINT), ('coins', POINT))
+SIZES = Size.sizes()
+
+
+def encode_level(level_data: dict, source_mtime_ns=0, source_size=0) -> bytes:
+    """Двоичное представление уровня. ValueError, если уровень не укладывается в формат"""
+    level_map = level_data['map']
+    try:
+        chunks = [HEADER.pack(MAGIC, VERSION, source_mtime_ns, source_size,
+                              *level_map['start'], *level_map['finish'],
+                              *(len(level_map[name]) for name, _ in SECTIONS))]
+
+        for d in level_map['platforms']:
+            angle = d.get('angle', 0)
+            # Угол хранится во float32; угол, который в нём не представим точно, изменил бы уровень
+            if struct.unpack('<f', struct.pack('<f', angle))[0] != angle:
+                raise ValueError(f'Angle {angle} is not representable as float32')
+            chunks.append(PLATFORM.pack(d['id'], *d['pos'], SIZES.index(d['size']), angle))
+        for d in level_map['ladders']:
+            chunks.append(LADDER.pack(d['id'], *d['pos'], SIZES.index(d['size'])))
+        for name in ('mines', 'coins'):
+            for d in level_map[name]:
+                chunks.append(POINT.pack(d['id'], *d['pos']))
+    except struct.error as e:
+        raise ValueError(str(e)) from e
+
+    return b''.join(chunks)
+
+
+class BinaryLevel:
+    """Уровень в двоичном формате, отображённый в память.
+
+    Передаётся в Level вместо словаря из JSON. Методы platforms(), ladders(), mines(), coins()
+    при каждом вызове создают новые спрайты прямо из записей файла.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.buffer) < HEADER.size:
+            raise ValueError(f'{path}: file is too short')
+
+        magic, version, self.source_mtime_ns, self.source_size, sx, sy, fx, fy, *counts = \
+            HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path}: unsupported level format {magic!r} v{version}')
+
+        self.start = (sx, sy)
+        self.finish = (fx, fy)
+
+        # Границы секций в буфере
+        self.sections = {}
+        offset = HEADER.size
+        for (name, record), count in zip(SECTIONS, counts):
+            self.sections[name] = (offset, offset + record.size * count, record)
+            offset += record.size * count
+
+        if offset != len(self.buffer):
+            raise ValueError(f'{path}: expected {offset} bytes, got {len(self.buffer)}')
+
+    def records(self, name):
+        start, end, record = self.sections[name]
+        return record.iter_unpack(memoryview(self.buffer)[start:end])
+
+    def platforms(self):
+        return [sprites.Platform(id, (x, y), SIZES[size], angle) for id, x, y, size, angle in self.records('platforms')]
+
+    def ladders(self):
+        return [sprites.Ladder(id, (x, y), SIZES[size]) for id, x, y, size in self.records('ladders')]
+
+    def mines(self):
+        return [sprites.Mine(id, (x, y)) for id, x, y in self.records('mines')]
+
+    def coins(self):
+        return [sprites.Coin(id, (x, y)) for id, x, y in self.records('coins')]
+
+
+def binary_path(json_path) -> Path:
+    return Path(CACHE_DIR) / 'levels' / (Path(json_path).stem + '.lvl')
+
+
+def convert(json_path, out_path=None, level_data=None) -> Path:
+    """Записывает двоичную копию JSON-уровня и возвращает её путь"""
+    out_path = Path(out_path or binary_path(json_path))
+    stat = os.stat(json_path)
+    if level_data is None:
+        with open(json_path) as f:
+            level_data = json.load(f)
+    data = encode_level(level_data, stat.st_mtime_ns, stat.st_size)
+
+    # Через временный файл, чтобы уже отображённая в память старая версия не изменилась
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix('.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def load_level_data(json_path):
+    """BinaryLevel из кэша, если он собран из текущей версии JSON, иначе словарь из JSON.
+
+    Во втором случае двоичная копия собирается заново для следующих загрузок.
+    """
+    stat = os.stat(json_path)
+    try:
+        level = BinaryLevel(binary_path(json_path))
+        if (level.source_mtime_ns, level.source_size) == (stat.st_mtime_ns, stat.st_size):
+            return level
+    except (OSError, ValueError):
+        pass
+
+    with open(json_path) as f:
+        level_data = json.load(f)
+
+    # Кэш необязателен: уровень вне формата или каталог только для чтения просто грузятся из JSON
+    try:
+        convert(json_path, level_data=level_data)
+    except (OSError, ValueError):
+        pass
+
+    return level_data
+
+
+if __name__ == '__main__':
+    from populate_levels import get_level_files
+
+    for file in sys.argv[1:] or get_level_files():
+        out = convert(file)
+        print(f"{file} -> {out}: {os.path.getsize(file)} -> {os.path.getsize(out)} байт")
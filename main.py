@@ -1,11 +1,15 @@
 import pygame
-from config import WINDOW_SIZE, FULLSCREEN, FPS
+from config import WINDOW_SIZE, FULLSCREEN, RENDER_FPS, TICK_RATE, MAX_TICKS_PER_FRAME, INTERPOLATION, DIRTY_RECTS
 from menu import MainMenu
 from game_logic import Game
 from scene import Scene
+from database import close_connection
+from repository import repository
+from migrations import run_migrations
 
 class GameManager:
     def __init__(self):
+        run_migrations()
         pygame.init()
         self.screen = pygame.display.set_mode(WINDOW_SIZE, pygame.FULLSCREEN * FULLSCREEN)
         pygame.display.set_caption("Platformer Adventure game")
@@ -13,24 +17,45 @@ class GameManager:
         self.current_scene: Scene = MainMenu(self)
 
     def return_to_menu(self, *args, **kwargs):
+        # При смене сцены прогресс должен быть уже записан в БД
+        repository.flush()
         self.current_scene = MainMenu(self, *args, **kwargs)
         
     def start_level(self, *args, **kwargs):
+        repository.flush()
         self.current_scene = Game(self, *args, **kwargs)
 
     def run(self):
+        tick_time = 1000 / TICK_RATE
+        accumulator = 0
         running = True
         while running:
+            # Симуляция идёт фиксированными шагами, отрисовка — с той частотой, какую тянет машина
+            accumulator = min(accumulator + self.clock.tick(RENDER_FPS), tick_time * MAX_TICKS_PER_FRAME)
+
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.current_scene.invalidate()
                 self.current_scene.handle_event(event)
             
-            self.current_scene.update()
-            self.current_scene.draw(self.screen)
+            while accumulator >= tick_time:
+                self.current_scene.update()
+                accumulator -= tick_time
+
+            scene = self.current_scene
+            scene.draw(self.screen, accumulator / tick_time if INTERPOLATION else 1.0)
             
-            pygame.display.flip()
-            self.clock.tick(FPS)
+            # Новая сцена и полные перерисовки выводятся целиком, остальные кадры — по изменённым областям
+            dirty_rects = scene.pop_dirty_rects()
+            if dirty_rects is None or not DIRTY_RECTS:
+                pygame.display.flip()
+            elif dirty_rects:
+                pygame.display.update(dirty_rects)
+
+        repository.flush()
+        close_connection()
 
 if __name__ == "__main__":
     manager = GameManager()
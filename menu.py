@@ -1,6 +1,7 @@
 import pygame
+from collections import OrderedDict
 from scene import Scene
-from database import get_all_levels, get_balance, unlock_level, purchase_level
+from repository import repository
 from config import (
     BACKGROUND_COLOR,
     WINDOW_SIZE,
@@ -8,22 +9,25 @@ from config import (
     DIFFICULTY_MEDIUM_CLR,
     DIFFICULTY_HARD_CLR,
     DIFFICULTY_UNKNOWN_CLR,
-    FPS
+    LEVEL_CARD_CACHE_SIZE
 )
 from notification import NotificationManager
+from fonts import get_font, text_cache
 
 class MainMenu(Scene):
     def __init__(self, game_manager):
+        super().__init__()
+
         self.game_manager = game_manager
-        self.levels = get_all_levels()
+        self.levels = repository.get_all_levels()
         self.notifications = NotificationManager()
         self.scroll_offset = 0
         self.max_scroll = 0
         
         # Графические ресурсы
-        self.font_title = pygame.font.Font('assets/fonts/Title-font.ttf', 72)
-        self.font_medium = pygame.font.Font(None, 36)
-        self.font_small = pygame.font.Font(None, 24)
+        self.font_title = get_font('assets/fonts/Title-font.ttf', 72)
+        self.font_medium = get_font(None, 36)
+        self.font_small = get_font(None, 24)
         self.lock_icon = pygame.transform.scale(
             pygame.image.load('assets/icons/lock.png').convert_alpha(), 
             (40, 40)
@@ -47,16 +51,39 @@ class MainMenu(Scene):
         self.buttons_per_row = WINDOW_SIZE[0] // (self.button_width + 30)
         self.rows = (len(self.levels) + self.buttons_per_row - 1) // self.buttons_per_row
         self.max_scroll = max(0, self.rows * (self.button_height + 30) - WINDOW_SIZE[1] + 250)
+        self.grid_padding = (WINDOW_SIZE[0] - (self.button_width + 30) * self.buttons_per_row + 30) // 2
+
+        # id уровня -> ((строка БД, статистика), по которым нарисована карточка, поверхность карточки)
+        self.level_cards = OrderedDict()
+        self.notification_rect = None
 
     def get_level_button_rect(self, index):
         start_y = 200 + self.scroll_offset
         row = index // self.buttons_per_row
         col = index % self.buttons_per_row
-        padding = (WINDOW_SIZE[0] - (self.button_width + 30) * self.buttons_per_row + 30) // 2
-        x = padding + col * (self.button_width + 30)
+        x = self.grid_padding + col * (self.button_width + 30)
         y = start_y + row * (self.button_height + 30)
         return pygame.Rect(x, y, self.button_width, self.button_height)
 
+    def get_level_index_at(self, pos):
+        """Индекс уровня, на карточку которого приходится точка, или None"""
+        col, x = divmod(pos[0] - self.grid_padding, self.button_width + 30)
+        row, y = divmod(pos[1] - 200 - self.scroll_offset, self.button_height + 30)
+        if not (0 <= col < self.buttons_per_row and row >= 0):
+            return None
+        if x >= self.button_width or y >= self.button_height:
+            return None
+
+        index = row * self.buttons_per_row + col
+        return index if index < len(self.levels) else None
+
+    def get_visible_level_indices(self):
+        """Индексы уровней, карточки которых видны между шапкой меню и нижним краем окна"""
+        row_height = self.button_height + 30
+        first_row = max(0, (-self.scroll_offset - self.button_height) // row_height + 1)
+        last_row = -(-(WINDOW_SIZE[1] - 200 - self.scroll_offset) // row_height)
+        return range(first_row * self.buttons_per_row, min(len(self.levels), last_row * self.buttons_per_row))
+
     def handle_event(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             mouse_pos = pygame.mouse.get_pos()
@@ -67,16 +94,16 @@ class MainMenu(Scene):
                 exit()
             
             # Проверка кликов по уровням
-            for i, level in enumerate(self.levels):
-                btn_rect = self.get_level_button_rect(i)
-                if btn_rect.collidepoint(mouse_pos):
-                    self.handle_level_click(level)
+            index = self.get_level_index_at(mouse_pos)
+            if index is not None:
+                self.handle_level_click(self.levels[index])
 
         elif event.type == pygame.MOUSEWHEEL:
             if event.y == 1:  # Скролл вверх
                 self.scroll_offset = min(self.scroll_offset + 20, 0)
             elif event.y == -1:  # Скролл вниз
                 self.scroll_offset = max(self.scroll_offset - 20, -self.max_scroll)
+            self.invalidate()
 
     def handle_level_click(self, level):
         if level['unlocked']:
@@ -84,25 +111,25 @@ class MainMenu(Scene):
         else:
             if level['cost'] is None:
                 if self.check_previous_level_completed(level['id']):
-                    unlock_level(level['id'])
-                    self.levels = get_all_levels()
+                    repository.unlock_level(level['id'])
+                    self.invalidate()
                 else:
                     self.notifications.show("Пройдите предыдущий уровень!", "error")
             else:
-                if purchase_level(level['id']):
-                    self.levels = get_all_levels()
+                if repository.purchase_level(level['id']):
+                    self.invalidate()
                     self.notifications.show("Уровень куплен!", "success")
                 else:
                     self.notifications.show("Недостаточно монет!", "error")
 
     def check_previous_level_completed(self, level_id):
-        prev_level = next((l for l in self.levels if l['id'] == level_id - 1), None)
+        prev_level = repository.get_level(level_id - 1)
         return prev_level and prev_level['unlocked'] and prev_level['coins_collected'] is not None
 
     def update(self):
         self.notifications.update()
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1.0):
         screen.fill(BACKGROUND_COLOR)
 
         # Отрисовка уровней
@@ -111,25 +138,27 @@ class MainMenu(Scene):
         pygame.draw.rect(screen, BACKGROUND_COLOR, pygame.Rect(0, 0, WINDOW_SIZE[0], 200))
         
         # Заголовок
-        title = self.font_title.render("Platformer Adventure", True, (255, 255, 255))
+        title = text_cache.render(self.font_title, "Platformer Adventure", True, (255, 255, 255))
         screen.blit(title, (WINDOW_SIZE[0]//2 - title.get_width()//2, 20))
         
         # Верхняя панель
         self.draw_top_panel(screen)
         
         # Уведомления
-        self.notifications.draw(screen)
-        
-        pygame.display.flip()
+        notification_rect = self.notifications.draw(screen)
+
+        # Кроме уведомления всё меняется только после прокрутки или покупки, тогда кадр выводится целиком
+        self.mark_dirty(self.notification_rect, notification_rect)
+        self.notification_rect = notification_rect
 
     def draw_top_panel(self, screen):
         panel_y = 120
         padding = 15
         
         # Баланс
-        balance = get_balance()
+        balance = repository.get_balance()
         coin_text = f"Баланс: {balance}"
-        text_surf = self.font_medium.render(coin_text, True, (255, 215, 0))
+        text_surf = text_cache.render(self.font_medium, coin_text, True, (255, 215, 0))
         
         # Вертикальное центрирование
         total_height = max(self.coin_icon.get_height(), text_surf.get_height())
@@ -159,11 +188,11 @@ class MainMenu(Scene):
         for i, (diff, label) in enumerate(items):
             x = start_x + i * 140
             pygame.draw.circle(screen, self.difficulty_colors[diff], (x, y_pos + 25), 10)
-            text = self.font_small.render(label, True, (200, 200, 200))
+            text = text_cache.render(self.font_small, label, True, (200, 200, 200))
             screen.blit(text, (x + 20, y_pos + 18))
 
     def draw_exit_button(self, screen, panel_y, element_height):
-        exit_text = self.font_medium.render("Выход", True, (255, 255, 255))
+        exit_text = text_cache.render(self.font_medium, "Выход", True, (255, 255, 255))
         btn_width = exit_text.get_width() + 40
         btn_height = exit_text.get_height() + 20
         
@@ -186,42 +215,72 @@ class MainMenu(Scene):
         screen.blit(exit_text, (text_x, text_y))
 
     def draw_level_buttons(self, screen):
-        for i, level in enumerate(self.levels):
-            btn_rect = self.get_level_button_rect(i)
-            color = self.difficulty_colors.get(level['difficulty'], DIFFICULTY_UNKNOWN_CLR)
-            
-            # Затемнение для заблокированных
-            if not level['unlocked']:
-                color = tuple(c // 2 for c in color)
-            
-            # Отрисовка кнопки уровня
-            pygame.draw.rect(screen, color, btn_rect, border_radius=12)
-            
-            # Текст уровня
-            if level['unlocked']:
-                level_text = f"Уровень {level['id']}" if level['cost'] is None else "Бонусный"
-                text_color = (255, 255, 255)
-            else:
-                level_text = f"{level['cost']} монет" if level['cost'] else "Заблокирован"
-                text_color = (150, 150, 150)
-            
-            text_surf = self.font_medium.render(level_text, True, text_color)
-            screen.blit(text_surf, (btn_rect.x + 20, btn_rect.y + 15))
-            
-            # Прогресс
-            if level['unlocked']:
-                coins_text = f"Монет собрано: {level['coins_collected'] or 0}/{level['max_coins']}"
-                time_text = f"Лучшее время: {self.format_time(level['time_spent'])}"
-                
-                # Отрисовка прогресса
-                self.draw_centered_text(screen, coins_text, btn_rect.x + 10, btn_rect.bottom - 50, self.button_width - 20)
-                self.draw_centered_text(screen, time_text, btn_rect.x + 10, btn_rect.bottom - 30, self.button_width - 20)
+        for i in self.get_visible_level_indices():
+            screen.blit(self.get_level_card(self.levels[i]), self.get_level_button_rect(i))
+
+    def get_level_card(self, level):
+        """Карточка уровня перерисовывается, только если изменилась его строка в БД или статистика"""
+        stats = repository.get_level_stats(level['id']) if level['unlocked'] else None
+        cached = self.level_cards.get(level['id'])
+        if cached and cached[0] == (level, stats):
+            self.level_cards.move_to_end(level['id'])
+            return cached[1]
+
+        card = self.render_level_card(level, stats)
+        self.level_cards[level['id']] = ((dict(level), stats), card)
+        if len(self.level_cards) > LEVEL_CARD_CACHE_SIZE:
+            self.level_cards.popitem(last=False)
+
+        return card
+
+    def render_level_card(self, level, stats=None):
+        card = pygame.Surface((self.button_width, self.button_height), pygame.SRCALPHA)
+        card_rect = card.get_rect()
+        color = self.difficulty_colors.get(level['difficulty'], DIFFICULTY_UNKNOWN_CLR)
+        
+        # Затемнение для заблокированных
+        if not level['unlocked']:
+            color = tuple(c // 2 for c in color)
+        
+        # Отрисовка кнопки уровня
+        pygame.draw.rect(card, color, card_rect, border_radius=12)
+        
+        # Текст уровня
+        if level['unlocked']:
+            level_text = f"Уровень {level['id']}" if level['cost'] is None else "Бонусный"
+            text_color = (255, 255, 255)
+        else:
+            level_text = f"{level['cost']} монет" if level['cost'] else "Заблокирован"
+            text_color = (150, 150, 150)
+        
+        text_surf = text_cache.render(self.font_medium, level_text, True, text_color)
+        card.blit(text_surf, (20, 15))
+        
+        # Статистика попыток
+        if stats and stats['attempts']:
+            attempts_text = f"Попыток: {stats['attempts']}, побед: {stats['win_rate']:.0%}"
+            self.draw_centered_text(card, attempts_text, 10, 55, self.button_width - 20)
+
+            if stats['wins']:
+                median, p90 = stats['percentiles'][0.5], stats['percentiles'][0.9]
+                times_text = f"Медиана {self.format_time(median)}, 90%: {self.format_time(p90)}"
+                self.draw_centered_text(card, times_text, 10, 78, self.button_width - 20)
+
+        # Прогресс
+        if level['unlocked']:
+            coins_text = f"Монет собрано: {level['coins_collected'] or 0}/{level['max_coins']}"
+            time_text = f"Лучшее время: {self.format_time(level['time_spent'])}"
             
-            # Иконка замка
-            if not level['unlocked']:
-                lock_pos = btn_rect.center
-                screen.blit(self.lock_icon, self.lock_icon.get_rect(center=lock_pos))
+            # Отрисовка прогресса
+            self.draw_centered_text(card, coins_text, 10, card_rect.bottom - 50, self.button_width - 20)
+            self.draw_centered_text(card, time_text, 10, card_rect.bottom - 30, self.button_width - 20)
+        
+        # Иконка замка
+        if not level['unlocked']:
+            card.blit(self.lock_icon, self.lock_icon.get_rect(center=card_rect.center))
+
+        return card
 
     def draw_centered_text(self, screen, text, x, y, width):
-        text_surf = self.font_small.render(text, True, (255, 255, 255))
+        text_surf = text_cache.render(self.font_small, text, True, (255, 255, 255))
         screen.blit(text_surf, (x + (width - text_surf.get_width()) // 2, y))
\ No newline at end of file
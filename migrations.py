@@ -1,29 +1,121 @@
-import sqlite3
-
-def run_migrations():
-    conn = sqlite3.connect('game.db')
-    c = conn.cursor()
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS User (
-                 id INTEGER PRIMARY KEY,
-                 balance INTEGER NOT NULL DEFAULT 0
-               )''')
-    
-    c.execute('''CREATE TABLE IF NOT EXISTS Level (
-                 id INTEGER PRIMARY KEY,
-                 difficulty TEXT NOT NULL,
-                 map_filepath TEXT NOT NULL,
-                 max_coins INTEGER NOT NULL,
-                 unlocked BOOLEAN NOT NULL DEFAULT 0,
-                 cost INTEGER,
-                 coins_collected INTEGER,
-                 time_spent REAL
-               )''')
-    
-    c.execute('INSERT OR IGNORE INTO User (id, balance) VALUES (1, 0)')
-    
-    conn.commit()
-    conn.close()
+import database
+
+# Схема БД по версиям. Версия хранится в PRAGMA user_version, миграция N переводит БД из версии N-1 в N.
+# Уже выпущенные миграции не меняются, изменения схемы добавляются новыми миграциями в конец списка.
+MIGRATIONS = [
+    # 1: исходная схема. IF NOT EXISTS, потому что БД из репозитория создана до появления версий
+    [
+        '''CREATE TABLE IF NOT EXISTS User (
+             id INTEGER PRIMARY KEY,
+             balance INTEGER NOT NULL DEFAULT 0
+           )''',
+        '''CREATE TABLE IF NOT EXISTS Level (
+             id INTEGER PRIMARY KEY,
+             difficulty TEXT NOT NULL,
+             map_filepath TEXT NOT NULL,
+             max_coins INTEGER NOT NULL,
+             unlocked BOOLEAN NOT NULL DEFAULT 0,
+             cost INTEGER,
+             coins_collected INTEGER,
+             time_spent REAL
+           )''',
+        'INSERT OR IGNORE INTO User (id, balance) VALUES (1, 0)',
+    ],
+    # 2: история попыток
+    [
+        '''CREATE TABLE IF NOT EXISTS Run (
+             id INTEGER PRIMARY KEY,
+             level_id INTEGER NOT NULL,
+             outcome TEXT NOT NULL,
+             time_spent REAL NOT NULL,
+             coins_collected INTEGER NOT NULL,
+             death_cause TEXT,
+             ticks INTEGER NOT NULL,
+             created_at INTEGER NOT NULL DEFAULT (strftime('%s', 'now'))
+           )''',
+        # Покрывающий индекс: число попыток по исходам и перцентили времени считаются без чтения таблицы
+        '''CREATE INDEX IF NOT EXISTS Run_level_outcome_time
+           ON Run (level_id, outcome, time_spent)''',
+        'ANALYZE',
+    ],
+    # 3: хэш содержимого файла уровня, по которому populate_levels пропускает неизменённые уровни
+    [
+        'ALTER TABLE Level ADD COLUMN content_hash TEXT',
+    ],
+    # 4: записанный ввод попытки (simulation.encode_inputs), по которому её можно повторить
+    [
+        'ALTER TABLE Run ADD COLUMN inputs BLOB',
+    ],
+    # 5: траектория лучшей попытки уровня (ghost.TraceWriter). Отдельно от Level, чтобы строки уровней оставались лёгкими
+    [
+        '''CREATE TABLE IF NOT EXISTS Ghost (
+             level_id INTEGER PRIMARY KEY,
+             trace BLOB NOT NULL
+           )''',
+    ],
+    # 6: итоги попыток по уровням, которые обновляются триггером при вставке в Run. Статистика уровня
+    # читается из них за время, не зависящее от числа попыток. Время побед — гистограмма по целым секундам
+    [
+        '''CREATE TABLE IF NOT EXISTS RunCount (
+             level_id INTEGER NOT NULL,
+             outcome TEXT NOT NULL,
+             runs INTEGER NOT NULL,
+             PRIMARY KEY (level_id, outcome)
+           ) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS RunWinTime (
+             level_id INTEGER NOT NULL,
+             bucket INTEGER NOT NULL,
+             wins INTEGER NOT NULL,
+             PRIMARY KEY (level_id, bucket)
+           ) WITHOUT ROWID''',
+        '''INSERT INTO RunCount (level_id, outcome, runs)
+           SELECT level_id, outcome, COUNT(*) FROM Run GROUP BY level_id, outcome''',
+        '''INSERT INTO RunWinTime (level_id, bucket, wins)
+           SELECT level_id, CAST(time_spent AS INTEGER), COUNT(*) FROM Run
+           WHERE outcome = 'WIN' GROUP BY level_id, CAST(time_spent AS INTEGER)''',
+        '''CREATE TRIGGER IF NOT EXISTS Run_aggregates AFTER INSERT ON Run
+           BEGIN
+             INSERT INTO RunCount (level_id, outcome, runs) VALUES (NEW.level_id, NEW.outcome, 1)
+             ON CONFLICT (level_id, outcome) DO UPDATE SET runs = runs + 1;
+             INSERT INTO RunWinTime (level_id, bucket, wins)
+             SELECT NEW.level_id, CAST(NEW.time_spent AS INTEGER), 1 WHERE NEW.outcome = 'WIN'
+             ON CONFLICT (level_id, bucket) DO UPDATE SET wins = wins + 1;
+           END''',
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version() -> int:
+    with database.locked() as conn:
+        return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations() -> int:
+    """Доводит схему БД до SCHEMA_VERSION. Возвращает число применённых миграций.
+
+    Если схема актуальна, выполняется только чтение PRAGMA user_version.
+    Каждая миграция применяется в своей транзакции вместе с новым номером версии,
+    поэтому прерванный запуск оставляет БД в одной из версий, а не между ними.
+    """
+    with database.locked() as conn:
+        version = get_schema_version()
+
+        for number in range(version + 1, SCHEMA_VERSION + 1):
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for statement in MIGRATIONS[number - 1]:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {number}')
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+
+        return max(0, SCHEMA_VERSION - version)
+
 
 if __name__ == '__main__':
-    run_migrations()
\ No newline at end of file
+    applied = run_migrations()
+    print(f"Применено миграций: {applied}, версия схемы: {get_schema_version()}")
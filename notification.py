@@ -1,4 +1,5 @@
 import pygame
+from fonts import get_font, text_cache
 from config import (
     NOTIFICATION_SUCCESS_CLR,
     NOTIFICATION_ERROR_CLR,
@@ -52,7 +53,7 @@ class NotificationManager:
 
     def draw(self, screen):
         if self.state == "hidden" or not self.current_notification:
-            return
+            return None
 
         text_color = (255, 255, 255)
         bg_color = {
@@ -62,8 +63,7 @@ class NotificationManager:
         }.get(self.current_notification["type"], NOTIFICATION_INFO_CLR)
 
         # Создаем поверхность с прозрачностью
-        font = pygame.font.Font(None, 28)
-        text_surf = font.render(self.current_notification["text"], True, text_color)
+        text_surf = text_cache.render(get_font(None, 28), self.current_notification["text"], True, text_color)
         padding = 20
         width = text_surf.get_width() + padding * 2
         height = text_surf.get_height() + padding * 2
@@ -73,4 +73,4 @@ class NotificationManager:
         surface.blit(text_surf, (padding, padding))
         surface.set_alpha(self.alpha)
         
-        screen.blit(surface, (screen.get_width() - width - 20, 20))
\ No newline at end of file
+        return screen.blit(surface, (screen.get_width() - width - 20, 20))
\ No newline at end of file
@@ -1,9 +1,9 @@
 import pygame
 import math
-import itertools
 
-from config import GRAVITY, PLAYER_SPEED, JUMP_STRENGTH, LADDER_CLIMBING_SPEED
-from sprites import load_image, scale_image
+from config import GRAVITY, PLAYER_SPEED, JUMP_STRENGTH, LADDER_CLIMBING_SPEED, SWEPT_COLLISION
+from sprites import image_cache
+from collision import separating_shifts, first_contact
 
 
 class Direction:
@@ -22,50 +22,72 @@ class Player(pygame.sprite.Sprite):
     CLIMBING_SPRITE_FILENAMES = ["character_1.png", "character_2.png"]
     FRAME_RATE_COEF = 7
     SPRITE_SCALE_COEF = 1 / 3
+    PUSH_OUT_PROBE_DEPTH = 2
+
+    _frame_table = None
 
     def __init__(self, pos, **kwargs):
         super().__init__(**kwargs)
 
         self.sprite_num = 0
 
-        self.running_images = list(itertools.chain(*(
-            [scale_image(load_image(fname), self.SPRITE_SCALE_COEF)] * self.FRAME_RATE_COEF
-            for fname in self.RUNNING_SPRITE_FILENAMES
-        )))
-        self.climbing_images = list(itertools.chain(*(
-            [scale_image(load_image(fname), self.SPRITE_SCALE_COEF)] * self.FRAME_RATE_COEF
-            for fname in self.CLIMBING_SPRITE_FILENAMES
-        )))
+        frame_table = self.get_frame_table()
+        self.running_frames = frame_table['running']
+        self.climbing_frames = frame_table['climbing']
 
-        self.image = self.running_images[self.sprite_num]
+        self.rotation = Direction.RIGHT
+        self.image, self.mask = self.running_frames[self.rotation][self.sprite_num // self.FRAME_RATE_COEF]
         self.rect = self.image.get_rect(midbottom=pos)
-        self.mask = pygame.mask.from_surface(self.image)
+        self.prev_pos = self.rect.topleft
+        # Точное положение для SWEPT_COLLISION, rect — его округление
+        self.pos = list(self.rect.topleft)
 
         self.velocity_x = 0
         self.velocity_y = 0
         self.on_ground = False
         self.climbing_ladder = None
-        self.rotation = Direction.RIGHT
 
-    def draw(self, screen: pygame.Surface):
-        screen.blit(self.image, self.rect)
+    @classmethod
+    def get_frame_table(cls):
+        """Кадры анимации (поверхность и маска) для обоих направлений. Строятся один раз на процесс"""
+        if cls._frame_table is None:
+            cls._frame_table = {}
+            for name, filenames in (('running', cls.RUNNING_SPRITE_FILENAMES),
+                                    ('climbing', cls.CLIMBING_SPRITE_FILENAMES)):
+                frames = [image_cache.get(fname, cls.SPRITE_SCALE_COEF) for fname in filenames]
+                flipped = [pygame.transform.flip(image, True, False) for image, _ in frames]
+                cls._frame_table[name] = {
+                    Direction.RIGHT: frames,
+                    Direction.LEFT: [(image, pygame.mask.from_surface(image)) for image in flipped],
+                }
+
+        return cls._frame_table
+
+    def draw(self, screen: pygame.Surface, alpha=1.0):
+        # Положение между предыдущим и текущим шагом симуляции
+        x = self.prev_pos[0] + (self.rect.x - self.prev_pos[0]) * alpha
+        y = self.prev_pos[1] + (self.rect.y - self.prev_pos[1]) * alpha
+        return screen.blit(self.image, (round(x), round(y)))
+
+    def freeze(self):
+        """Симуляция остановлена: дальше рисуем в текущем положении при любом alpha"""
+        self.prev_pos = self.rect.topleft
+
+    def set_frame(self):
+        self.image, self.mask = self.running_frames[self.rotation][self.sprite_num // self.FRAME_RATE_COEF]
+        self.rect = self.image.get_rect(center=self.rect.center)
 
     def rotate(self, direction):
         if (self.rotation != direction):
             self.rotation = direction
-            self.image = pygame.transform.flip(self.image, True, False)
-            self.rect = self.image.get_rect(center=self.rect.center)
-            self.mask = pygame.mask.from_surface(self.image)
+            self.set_frame()
 
     def switch_frame(self):
-        self.sprite_num = (self.sprite_num + 1) % len(self.running_images)
-        direction = self.rotation
-        self.image = self.running_images[self.sprite_num]
-        self.rotation = Direction.RIGHT
-        self.rotate(direction)
+        self.sprite_num = (self.sprite_num + 1) % (len(self.RUNNING_SPRITE_FILENAMES) * self.FRAME_RATE_COEF)
+        self.set_frame()
 
-    def jump(self, platforms):
-        if self.is_on_ground(platforms) or self.climbing_ladder and self.climbing_ladder.rect.top > self.rect.center[1]:
+    def jump(self, solid):
+        if self.is_on_ground(solid) or self.climbing_ladder and self.climbing_ladder.rect.top > self.rect.center[1]:
             self.velocity_y -= JUMP_STRENGTH
 
     def go(self, direction):
@@ -97,64 +119,94 @@ class Player(pygame.sprite.Sprite):
             case Direction.RIGHT:
                 self.rect.x += delta
 
-    def push_out(self, platform):
-        if not pygame.sprite.collide_mask(self, platform):
+    def push_out(self, solid):
+        if not pygame.sprite.collide_mask(self, solid):
             return
 
-        for delta in range(max(platform.mask.get_size()) + max(self.mask.get_size())):
+        # Почти всегда хватает сдвига на пиксель-два: приземление, шаг по склону, упор в стену.
+        # Такие сдвиги проверяются пробами в порядке Direction.directions(), и первая удачная проба
+        # совпадает с тем, что выбрал бы полный поиск ниже
+        for delta in range(1, self.PUSH_OUT_PROBE_DEPTH + 1):
             for direction in Direction.directions():
                 self.force_move(direction, delta)
-
-                if pygame.sprite.collide_mask(self, platform):
-                    self.force_move(direction, -delta)
-                else:
+                if not pygame.sprite.collide_mask(self, solid):
                     return
+                self.force_move(direction, -delta)
+
+        # Выталкиваем на наименьшее расстояние; при равенстве приоритет у направлений в порядке Direction.directions()
+        max_delta = solid.part_size + max(self.mask.get_size())
+        delta, direction = min(zip(separating_shifts(self, solid, max_delta), Direction.directions()),
+                               key=lambda x: x[0])
+        if delta < max_delta:
+            self.force_move(direction, delta)
             
-    def check_handle_collisions(self, platforms) -> bool:
-        pushed = False
-        for _ in range(len(platforms)):
-            for platform in platforms:
-                if pygame.sprite.collide_mask(self, platform):
-                    self.push_out(platform)
-                    pushed = True
-                    break
-            else:
-                break
-        
-        return pushed
+    def check_handle_collisions(self, solid) -> bool:
+        # solid — все платформы уровня одной маской, поэтому выталкивание сразу выводит из всех
+        if pygame.sprite.collide_mask(self, solid):
+            self.push_out(solid)
+            return True
+
+        return False
     
-    def is_on_ground(self, platforms) -> bool:
+    def is_on_ground(self, solid) -> bool:
         self.force_move(Direction.DOWN)
-        res = any(map(lambda x: pygame.sprite.collide_mask(self, x), platforms))
+        res = pygame.sprite.collide_mask(self, solid) is not None
         self.force_move(Direction.UP)
         return res
 
-    def update(self, platforms, ladders, mines, coins):
+    def move_swept(self, solid):
+        """Перемещение за шаг симуляции сразу до первого касания по каждой оси, без дробления на пиксели"""
+        if (round(self.pos[0]), round(self.pos[1])) != self.rect.topleft:
+            # rect сдвинут в обход pos: смена кадра анимации
+            self.pos = list(self.rect.topleft)
+
+        for axis, velocity in enumerate((self.velocity_x, self.velocity_y)):
+            target = self.pos[axis] + velocity
+            distance = round(target) - self.rect[axis]
+            contact = first_contact(self, solid, axis, distance) if distance else None
+            if contact is None:
+                self.pos[axis] = target
+                self.rect[axis] = round(target)
+                continue
+
+            # Касание разрешается так же, как при пошаговом движении; дробная часть после выталкивания теряется
+            self.rect[axis] += contact
+            self.push_out(solid)
+            self.pos = list(self.rect.topleft)
+            if axis == 1:
+                self.velocity_y = 0
+
+    def update(self, solid, ladders, mines, coins):
+        self.prev_pos = self.rect.topleft
+
         # Применяем гравитацию
-        if not self.climbing_ladder and not self.is_on_ground(platforms):
+        if not self.climbing_ladder and not self.is_on_ground(solid):
             self.velocity_y += GRAVITY
             # self.velocity_y = min(self.velocity_y, MAX_FALL_SPEED)  # Ограничиваем скорость падения
 
         if self.velocity_x:
             self.switch_frame()
 
-        x_steps = int(abs(self.velocity_x))
-        y_steps = int(abs(self.velocity_y))
+        if SWEPT_COLLISION:
+            self.move_swept(solid)
+        else:
+            x_steps = int(abs(self.velocity_x))
+            y_steps = int(abs(self.velocity_y))
 
-        for _ in range(x_steps):
-            self.rect.x += self.velocity_x / x_steps
-            if self.check_handle_collisions(platforms):
-                break
+            for _ in range(x_steps):
+                self.rect.x += self.velocity_x / x_steps
+                if self.check_handle_collisions(solid):
+                    break
 
-        for _ in range(y_steps):
-            self.rect.y += self.velocity_y / y_steps
-            if self.check_handle_collisions(platforms):
-                self.velocity_y = 0
-                break
+            for _ in range(y_steps):
+                self.rect.y += self.velocity_y / y_steps
+                if self.check_handle_collisions(solid):
+                    self.velocity_y = 0
+                    break
 
         # Логика для лестниц
         self.climbing_ladder = None
-        for ladder in ladders:
+        for ladder in ladders.query(self.rect):
             if pygame.sprite.collide_mask(self, ladder):
                 if not self.climbing_ladder or self.climbing_ladder.rect.top > ladder.rect.top:
                     self.climbing_ladder = ladder
@@ -163,11 +215,11 @@ class Player(pygame.sprite.Sprite):
             self.velocity_y = 0  # Останавливаем падение на лестнице
 
         # Логика для мин
-        for mine in mines:
+        for mine in mines.query(self.rect):
             if pygame.sprite.collide_mask(self, mine):
                 mine.explode_update()
 
         # Логика для монет
-        for coin in coins:
+        for coin in coins.query(self.rect):
             if pygame.sprite.collide_mask(self, coin):
                 coin.on_pick_up()
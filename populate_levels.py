@@ -1,9 +1,18 @@
+import argparse
+import hashlib
 import json
 import os
 import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import database
+from migrations import run_migrations
+
 LEVELS_DIR = Path("levels")
+MANIFEST_PATH = LEVELS_DIR / "manifest.json"
+POOL_MIN_FILES = 64
 
 def get_level_files():
     return sorted(LEVELS_DIR.glob("level_*.json"), key=lambda x: int(x.stem.split("_")[1]))
@@ -18,6 +27,13 @@ def parse_level(file_path):
         "max_coins": len(coins)
     }
 
+def content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+def parse_level_data(data: bytes) -> int:
+    """Число монет на уровне по содержимому файла"""
+    return len(json.loads(data).get("map", {}).get("coins", []))
+
 def get_level_metadata():
     levels = []
     for file in get_level_files():
@@ -49,6 +65,101 @@ def prompt_difficulty_and_cost(level_id):
         except ValueError:
             print("Некорректная стоимость!")
 
+def load_manifest(path):
+    """Сложность и стоимость уровней: {"level_17.json": {"difficulty": "EASY", "cost": 5}, ...}"""
+    with open(path) as f:
+        return json.load(f)
+
+def get_difficulty_and_cost(manifest, file):
+    """То же, что prompt_difficulty_and_cost, но из манифеста; уровни без записи получают UNKNOWN"""
+    entry = manifest.get(file.name, {})
+    cost = entry.get("cost")
+    return entry.get("difficulty", "UNKNOWN").upper(), cost if cost and cost > 0 else None
+
+def assign_level_ids(files, manifest):
+    """id уровней по той же схеме, что и в интерактивном режиме: обычные 1, 2, ..., бонусные 1001, 1002, ..."""
+    ids = []
+    bonus_count = 0
+    for i, file in enumerate(files, 1):
+        _, cost = get_difficulty_and_cost(manifest, file)
+        bonus_count += bool(cost)
+        ids.append(i - bonus_count if not cost else bonus_count + 1000)
+    return ids
+
+def parse_level_file(path):
+    """Число монет на уровне или текст ошибки; выполняется в процессе пула"""
+    try:
+        with open(path, "rb") as f:
+            return parse_level_data(f.read())
+    except (json.JSONDecodeError, ValueError) as e:
+        return str(e)
+
+def sync_levels(manifest_path=MANIFEST_PATH, workers=None):
+    """Пакетный импорт уровней без вопросов в stdin.
+
+    Сложность и стоимость берутся из манифеста. Файлы, хэш которых совпадает с импортированным,
+    не разбираются заново, а если не изменились и их id, сложность и стоимость, то и не записываются.
+    Остальные разбираются пулом процессов, и все строки записываются одной транзакцией.
+    Прогресс игрока (unlocked, coins_collected, time_spent) у существующих уровней сохраняется.
+    Возвращает (число записанных уровней, число пропущенных без изменений).
+    """
+    manifest = load_manifest(manifest_path)
+    files = get_level_files()
+
+    run_migrations()
+    with database.locked() as conn:
+        imported = {row['map_filepath']: row for row in conn.execute(
+            'SELECT id, difficulty, map_filepath, cost, max_coins, content_hash FROM Level')}
+
+    rows = []
+    to_parse = []
+    unchanged = 0
+    for level_id, file in zip(assign_level_ids(files, manifest), files):
+        difficulty, cost = get_difficulty_and_cost(manifest, file)
+
+        with open(file, "rb") as f:
+            digest = content_hash(f.read())
+
+        row = [level_id, difficulty, str(file), None, int(level_id == 1), cost, digest]
+        old = imported.get(str(file))
+        if old is not None and old['content_hash'] == digest:
+            if (old['id'], old['difficulty'], old['cost']) == (level_id, difficulty, cost):
+                unchanged += 1
+                continue
+            row[3] = old['max_coins']
+        else:
+            to_parse.append(row)
+        rows.append(row)
+
+    paths = [row[2] for row in to_parse]
+    workers = workers or os.cpu_count()
+    # Запуск пула дороже разбора нескольких файлов, поэтому небольшие пачки разбираются здесь же
+    if workers > 1 and len(paths) >= POOL_MIN_FILES:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(parse_level_file, paths, chunksize=max(1, len(paths) // (workers * 4))))
+    else:
+        results = list(map(parse_level_file, paths))
+
+    for row, max_coins in zip(to_parse, results):
+        if isinstance(max_coins, str):
+            print(f"Error processing {Path(row[2]).name}: {max_coins}")
+        else:
+            row[3] = max_coins
+
+    rows = [row for row in rows if row[3] is not None]
+    with database.transaction() as conn:
+        conn.executemany('''INSERT INTO Level
+                            (id, difficulty, map_filepath, max_coins, unlocked, cost, content_hash)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)
+                            ON CONFLICT (id) DO UPDATE SET
+                              difficulty = excluded.difficulty,
+                              map_filepath = excluded.map_filepath,
+                              max_coins = excluded.max_coins,
+                              cost = excluded.cost,
+                              content_hash = excluded.content_hash''', rows)
+
+    return len(rows), unchanged
+
 def main():
     levels = get_level_metadata()
     print("LEN:", len(levels))
@@ -86,4 +197,15 @@ def main():
         conn.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Импорт уровней из levels/ в БД")
+    parser.add_argument("--manifest", nargs="?", const=str(MANIFEST_PATH),
+                        help="пакетный режим: сложность и стоимость из манифеста вместо ввода")
+    parser.add_argument("--workers", type=int, help="число процессов для разбора файлов")
+    args = parser.parse_args()
+
+    if args.manifest:
+        start = time.perf_counter()
+        written, skipped = sync_levels(args.manifest, args.workers)
+        print(f"Записано уровней: {written}, без изменений: {skipped} ({time.perf_counter() - start:.2f} с)")
+    else:
+        main()
\ No newline at end of file
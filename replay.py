@@ -0,0 +1,111 @@
+"""Повтор сохранённых попыток по записанному вводу без окна, с максимальной скоростью.
+
+Запуск: python replay.py [id попыток] [--level ID] [--workers N] [--dump ID].
+Каждая попытка проигрывается заново, и её исход, число тиков, монеты и причина смерти
+сравниваются с записанными в Run. Расхождение означает, что результат не воспроизводится:
+изменилась физика или уровень, либо результат записан не игрой.
+"""
+import os
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+
+import database
+from database import RunOutcome
+from headless import STATUS_NAMES, format_inputs, init_dummy_display
+from level import Status
+from level_format import load_level_data
+from migrations import run_migrations
+from simulation import LevelSimulation, decode_inputs
+
+# Сколько попыток одного уровня отдаётся процессу за раз
+RUNS_PER_TASK = 64
+
+EXPECTED_STATUS = {
+    RunOutcome.WIN: Status.FINISHED,
+    RunOutcome.FAIL: Status.FAILED,
+    RunOutcome.ABANDONED: Status.IN_PROGRESS,
+}
+
+
+def replay_run(run, level_data):
+    """Проигрывает попытку и возвращает описание расхождения с записью или None"""
+    simulation = LevelSimulation(run['level_id'], level_data, decode_inputs(run['inputs']))
+    # Брошенная попытка длится ровно записанное число тиков, законченная должна закончиться на нём же
+    max_ticks = run['ticks'] if run['outcome'] == RunOutcome.ABANDONED else run['ticks'] + 1
+    status = simulation.run(max_ticks)
+
+    expected = (EXPECTED_STATUS[run['outcome']], run['ticks'], run['coins_collected'], run['death_cause'])
+    actual = (status, simulation.ticks, simulation.level.coins_collected(), simulation.level.fail_cause)
+    if actual == expected:
+        return None
+    return (f"записано {run['outcome']} за {run['ticks']} тиков, монет {run['coins_collected']}; "
+            f"повтор: {STATUS_NAMES[status]} за {simulation.ticks} тиков, "
+            f"монет {simulation.level.coins_collected()}, причина {simulation.level.fail_cause}")
+
+
+def replay_runs(map_filepath, runs):
+    """Проигрывает попытки одного уровня; возвращает [(id попытки, расхождение или None)]"""
+    level_data = load_level_data(map_filepath)
+    return [(run['id'], replay_run(run, level_data)) for run in runs]
+
+
+def make_tasks(runs):
+    runs = sorted(runs, key=itemgetter('map_filepath'))
+    for map_filepath, level_runs in groupby(runs, key=itemgetter('map_filepath')):
+        level_runs = list(level_runs)
+        for i in range(0, len(level_runs), RUNS_PER_TASK):
+            yield map_filepath, level_runs[i:i + RUNS_PER_TASK]
+
+
+def verify_runs(runs, workers=None):
+    """Проигрывает попытки и возвращает {id попытки: расхождение} для тех, что не воспроизвелись"""
+    tasks = list(make_tasks(runs))
+    workers = workers or os.cpu_count()
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(workers, initializer=init_dummy_display) as pool:
+            results = pool.map(replay_runs, *zip(*tasks))
+            return {run_id: error for chunk in results for run_id, error in chunk if error}
+
+    init_dummy_display()
+    return {run_id: error for task in tasks for run_id, error in replay_runs(*task) if error}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Повтор сохранённых попыток по записанному вводу')
+    parser.add_argument('runs', nargs='*', type=int, help='id попыток (по умолчанию все с записанным вводом)')
+    parser.add_argument('--level', type=int, help='только попытки этого уровня')
+    parser.add_argument('--workers', type=int, help='число процессов')
+    parser.add_argument('--dump', type=int, metavar='ID', help='вывести ввод попытки как сценарий для headless.py --inputs')
+    args = parser.parse_args()
+
+    run_migrations()
+
+    if args.dump is not None:
+        runs = database.get_recorded_runs([args.dump])
+        if not runs:
+            sys.exit(f"Попытка {args.dump} без записанного ввода")
+        print(json.dumps(format_inputs(decode_inputs(runs[0]['inputs']))))
+        return
+
+    runs = database.get_recorded_runs(args.runs, args.level)
+
+    start = time.perf_counter()
+    errors = verify_runs(runs, args.workers)
+    elapsed = time.perf_counter() - start
+
+    for run_id, error in sorted(errors.items()):
+        print(f"Попытка {run_id}: {error}")
+    ticks = sum(run['ticks'] for run in runs)
+    print(f"Проверено попыток: {len(runs)} ({ticks} тиков) за {elapsed:.2f} с, не воспроизвелись: {len(errors)}")
+
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+from typing import List, Dict, Optional
+
+import database
+
+
+class ProgressRepository:
+    """Строки Level и баланс User, которые держатся в памяти процесса.
+
+    Кроме этого процесса в БД никто не пишет, поэтому строки читаются один раз. Изменения
+    сразу применяются к строкам в памяти, а в БД записываются фоновым потоком database.write_queue
+    в том же порядке. Ни чтение, ни запись не ждут диска.
+    """
+
+    def __init__(self):
+        self.levels = None
+        self.levels_by_id = None
+        self.balance = None
+        # Итоги попыток по уровням (см. database.get_run_aggregates) и посчитанная по ним статистика
+        self.run_counts = None
+        self.win_times = None
+        self.level_stats = {}
+        self.ghosts = {}
+
+    def load(self):
+        self.levels = database.get_all_levels()
+        self.levels_by_id = {level['id']: level for level in self.levels}
+        self.balance = database.get_balance()
+        self.run_counts, self.win_times = database.get_run_aggregates()
+        self.level_stats = {}
+
+    def ensure_loaded(self):
+        if self.levels is None:
+            self.load()
+
+    def get_all_levels(self) -> List[Dict]:
+        self.ensure_loaded()
+        return self.levels
+
+    def get_level(self, level_id: int) -> Optional[Dict]:
+        self.ensure_loaded()
+        return self.levels_by_id.get(level_id)
+
+    def get_balance(self) -> int:
+        self.ensure_loaded()
+        return self.balance
+
+    def level_win(self, level_id: int,
+                  coins_collected: Optional[int] = None,
+                  time_spent: Optional[float] = None,
+                  trace: Optional[bytes] = None):
+        self.ensure_loaded()
+        database.write_queue.submit(database.write_level_win, level_id, coins_collected, time_spent, trace)
+
+        # То же, что делает database.write_level_win, но над строками в памяти
+        next_level = self.levels_by_id.get(level_id + 1)
+        if next_level and next_level['cost'] is None:
+            next_level['unlocked'] = 1
+
+        level = self.levels_by_id[level_id]
+        old_coins = level['coins_collected'] if level['coins_collected'] is not None else -1
+        old_time = level['time_spent'] if level['time_spent'] is not None else 1e999
+
+        if coins_collected is not None and coins_collected > old_coins:
+            level['coins_collected'] = coins_collected
+            self.balance += coins_collected - old_coins
+
+        if time_spent is not None and time_spent < old_time:
+            level['time_spent'] = time_spent
+            if trace is not None:
+                self.ghosts[level_id] = trace
+
+    def unlock_level(self, level_id: int):
+        self.ensure_loaded()
+        database.write_queue.submit(database.write_unlock_level, level_id)
+        self.levels_by_id[level_id]['unlocked'] = 1
+
+    def purchase_level(self, level_id: int) -> bool:
+        """Пытается купить бонусный уровень. Возвращает True при успехе"""
+        self.ensure_loaded()
+        level = self.levels_by_id[level_id]
+        if self.balance < level['cost']:
+            return False
+
+        database.write_queue.submit(database.write_purchase_level, level_id)
+        self.balance -= level['cost']
+        level['unlocked'] = 1
+        return True
+
+    def get_level_stats(self, level_id: int) -> Dict:
+        """Статистика попыток уровня; считается по итогам в памяти, без обращения к БД"""
+        self.ensure_loaded()
+        if level_id not in self.level_stats:
+            self.level_stats[level_id] = database.level_stats_from_aggregates(
+                self.run_counts.get(level_id, {}), self.win_times.get(level_id, {}))
+        return self.level_stats[level_id]
+
+    def get_ghost(self, level_id: int) -> Optional[bytes]:
+        """Траектория лучшей попытки уровня; из БД читается один раз"""
+        if level_id not in self.ghosts:
+            self.flush()
+            self.ghosts[level_id] = database.get_ghost(level_id)
+        return self.ghosts[level_id]
+
+    def record_run(self, level_id: int, outcome: str, time_spent: float, coins_collected: int,
+                   death_cause: Optional[str] = None, ticks: int = 0, inputs: Optional[bytes] = None):
+        self.ensure_loaded()
+        database.write_queue.submit(database.write_run, level_id, outcome, time_spent,
+                                    coins_collected, death_cause, ticks, inputs)
+
+        # То же, что делает триггер Run_aggregates, но над итогами в памяти
+        counts = self.run_counts.setdefault(level_id, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+        if outcome == database.RunOutcome.WIN:
+            histogram = self.win_times.setdefault(level_id, {})
+            bucket = database.time_bucket(time_spent)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        self.level_stats.pop(level_id, None)
+
+    def flush(self):
+        """Дожидается записи всех изменений в БД"""
+        database.write_queue.flush()
+
+    def reset_all(self):
+        self.ensure_loaded()
+        database.write_queue.submit(database.write_reset_all)
+
+        self.balance = 0
+        self.ghosts = {level['id']: None for level in self.levels}
+        for level in self.levels:
+            level['unlocked'] = int(level['id'] == 1)
+            level['coins_collected'] = None
+            level['time_spent'] = None
+
+
+repository = ProgressRepository()
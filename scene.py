@@ -2,6 +2,22 @@ from abc import ABC, abstractmethod
 
 
 class Scene(ABC):
+    def __init__(self):
+        # Области экрана, изменённые за кадр; None — кадр нужно вывести целиком
+        self.dirty_rects = None
+
+    def invalidate(self):
+        """Следующий кадр будет перерисован и выведен на экран целиком"""
+        self.dirty_rects = None
+
+    def mark_dirty(self, *rects):
+        if self.dirty_rects is not None:
+            self.dirty_rects.extend(rect for rect in rects if rect)
+
+    def pop_dirty_rects(self):
+        rects, self.dirty_rects = self.dirty_rects, []
+        return rects
+
     @abstractmethod
     def handle_event(self, event):
         ...
@@ -11,7 +27,8 @@ class Scene(ABC):
         ...
     
     @abstractmethod
-    def draw(self, screen):
+    def draw(self, screen, alpha=1.0):
+        """alpha — доля шага симуляции, прошедшая с последнего update (для интерполяции)"""
         ...
 
     def format_time(self, seconds):
@@ -0,0 +1,120 @@
+import pygame
+
+from config import TICK_RATE
+from level import Level, Status
+from player import Direction
+from varint import write_varint, read_varint
+
+
+KEY_DIRECTIONS = {
+    pygame.K_LEFT: Direction.LEFT,
+    pygame.K_RIGHT: Direction.RIGHT,
+    pygame.K_UP: Direction.UP,
+    pygame.K_DOWN: Direction.DOWN,
+}
+
+# Клавиши, которые доходят до игрока; только они записываются во ввод попытки
+RECORDED_KEYS = (*KEY_DIRECTIONS, pygame.K_SPACE)
+INPUTS_FORMAT_VERSION = 1
+
+
+def apply_key_event(level: Level, event_type, key):
+    """Передаёт нажатие или отпускание клавиши игроку уровня"""
+    if event_type == pygame.KEYDOWN:
+        if key in KEY_DIRECTIONS:
+            level.player.go(KEY_DIRECTIONS[key])
+        elif key == pygame.K_SPACE:
+            level.player.jump(level.solid)
+
+    elif event_type == pygame.KEYUP:
+        if key in KEY_DIRECTIONS:
+            level.player.stop(KEY_DIRECTIONS[key])
+
+
+def apply_held_keys(level: Level, is_pressed):
+    """Удерживаемые стрелки вверх/вниз продолжают подъём или спуск по лестнице"""
+    if is_pressed(pygame.K_UP):
+        level.player.go(Direction.UP)
+    if is_pressed(pygame.K_DOWN):
+        level.player.go(Direction.DOWN)
+
+
+def encode_inputs(inputs) -> bytes:
+    """Сжатая запись ввода (tick, event_type, key) из RECORDED_KEYS, отсортированного по tick.
+
+    Байт версии, затем на событие одно беззнаковое varint-число: разность с tick предыдущего
+    события, сдвинутая на 4 бита, и код события (номер клавиши * 2 + нажатие) в младших битах.
+    События с разницей до 8 тиков занимают байт, до 1024 — два.
+    """
+    data = bytearray([INPUTS_FORMAT_VERSION])
+    prev_tick = 0
+    for tick, event_type, key in inputs:
+        write_varint(data, (tick - prev_tick) << 4 | RECORDED_KEYS.index(key) * 2 | (event_type == pygame.KEYDOWN))
+        prev_tick = tick
+    return bytes(data)
+
+
+def decode_inputs(data: bytes):
+    """Обратное к encode_inputs: список (tick, event_type, key)"""
+    if not data or data[0] != INPUTS_FORMAT_VERSION:
+        raise ValueError(f'Unsupported inputs format {data[:1]!r}')
+
+    inputs = []
+    tick = 0
+    offset = 1
+    while offset < len(data):
+        value, offset = read_varint(data, offset)
+        tick += value >> 4
+        code = value & 0xf
+        inputs.append((tick, pygame.KEYDOWN if code & 1 else pygame.KEYUP, RECORDED_KEYS[code >> 1]))
+    return inputs
+
+
+class LevelSimulation:
+    """Прохождение уровня по шагам без окна и часов: те же шаги, что и в Game.update.
+
+    Ввод задаётся списком (tick, event_type, key), отсортированным по tick.
+    """
+
+    def __init__(self, level_id, level_data, inputs=()):
+        self.level = Level(level_id, level_data)
+        self.inputs = list(inputs)
+        self.input_index = 0
+        self.pressed = set()
+        self.ticks = 0
+        self.finished = False
+
+    @property
+    def elapsed_time(self):
+        return self.ticks / TICK_RATE
+
+    def key_event(self, event_type, key):
+        if event_type == pygame.KEYDOWN:
+            self.pressed.add(key)
+        elif event_type == pygame.KEYUP:
+            self.pressed.discard(key)
+
+        apply_key_event(self.level, event_type, key)
+
+    def step(self):
+        while self.input_index < len(self.inputs) and self.inputs[self.input_index][0] <= self.ticks:
+            _, event_type, key = self.inputs[self.input_index]
+            self.key_event(event_type, key)
+            self.input_index += 1
+
+        self.level.update()
+
+        if self.finished:
+            return
+
+        self.ticks += 1
+        apply_held_keys(self.level, self.pressed.__contains__)
+
+        if self.level.get_status() != Status.IN_PROGRESS:
+            self.finished = True
+
+    def run(self, max_ticks):
+        while not self.finished and self.ticks < max_ticks:
+            self.step()
+
+        return self.level.get_status()
@@ -0,0 +1,59 @@
+import pygame
+from collections import defaultdict
+
+from config import SPATIAL_HASH_CELL_SIZE
+
+
+class SpatialHashGroup(pygame.sprite.Group):
+    """Группа спрайтов с индексом по равномерной сетке.
+
+    Спрайты раскладываются по ячейкам, которые пересекает их rect, при добавлении в группу
+    и убираются из них при удалении (в том числе через sprite.kill()). Предполагается,
+    что rect спрайта не меняется, пока он состоит в группе.
+    """
+
+    def __init__(self, *sprites, cell_size=SPATIAL_HASH_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.sprite_cells = {}
+        self.order = {}
+        self.counter = 0
+        super().__init__(*sprites)
+
+    def cells_for_rect(self, rect):
+        left = rect.left // self.cell_size
+        top = rect.top // self.cell_size
+        right = (rect.right - 1) // self.cell_size
+        bottom = (rect.bottom - 1) // self.cell_size
+
+        return [(x, y) for x in range(left, right + 1) for y in range(top, bottom + 1)]
+
+    def add_internal(self, sprite, layer=None):
+        super().add_internal(sprite, layer)
+
+        cells = self.cells_for_rect(sprite.rect)
+        for cell in cells:
+            self.cells[cell].append(sprite)
+
+        self.sprite_cells[sprite] = cells
+        self.order[sprite] = self.counter
+        self.counter += 1
+
+    def remove_internal(self, sprite):
+        super().remove_internal(sprite)
+
+        for cell in self.sprite_cells.pop(sprite, ()):
+            bucket = self.cells[cell]
+            bucket.remove(sprite)
+            if not bucket:
+                del self.cells[cell]
+
+        self.order.pop(sprite, None)
+
+    def query(self, rect):
+        """Возвращает спрайты из ячеек, которые пересекает rect, в порядке добавления в группу"""
+        found = set()
+        for cell in self.cells_for_rect(rect):
+            found.update(self.cells.get(cell, ()))
+
+        return sorted(found, key=self.order.__getitem__)
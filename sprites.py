@@ -1,6 +1,12 @@
 import pygame
 import os
-from PIL import Image
+import hashlib
+import mmap
+import struct
+import tempfile
+from collections import OrderedDict
+
+from config import IMAGE_CACHE_MAX_BYTES, CACHE_DIR
 
 
 def load_image(name):
@@ -11,6 +17,8 @@ def load_image(name):
 
 
 def load_GIF(filename):
+    from PIL import Image
+
     filename = os.path.join('assets', 'sprites', filename)
     pil_image = Image.open(filename)
 
@@ -37,6 +45,238 @@ def scale_image(image: pygame.Surface, scale_coef: float):
     return pygame.transform.scale(image, scaled_size)
 
 
+_animation_cache = {}
+
+
+def load_animation(filename, scale_coef=1) -> list[pygame.Surface]:
+    """Отмасштабированные кадры GIF-анимации, общие на процесс.
+
+    Кадры запекаются в PNG-ленту в CACHE_DIR (имя зависит от содержимого GIF и масштаба),
+    поэтому при следующих запусках GIF не декодируется через PIL.
+    """
+    key = (filename, scale_coef)
+    if key in _animation_cache:
+        return _animation_cache[key]
+
+    with open(os.path.join('assets', 'sprites', filename), 'rb') as f:
+        digest = hashlib.sha1(f.read() + str(scale_coef).encode()).hexdigest()[:16]
+
+    name = os.path.splitext(filename)[0]
+    strips = [f for f in os.listdir(CACHE_DIR) if f.startswith(f'{name}-{digest}-') and f.endswith('.png')] \
+        if os.path.isdir(CACHE_DIR) else []
+
+    frames = None
+    for strip in strips:
+        frames = load_animation_strip(os.path.join(CACHE_DIR, strip))
+        if frames is not None:
+            break
+        # Повреждённая лента иначе читалась бы при каждом запуске
+        try:
+            os.remove(os.path.join(CACHE_DIR, strip))
+        except OSError:
+            pass
+
+    if frames is None:
+        frames = [scale_image(frame, scale_coef) for frame in load_GIF(filename)]
+        save_animation_strip(frames, os.path.join(CACHE_DIR, f'{name}-{digest}-{len(frames)}.png'))
+
+    if pygame.display.get_surface() is not None:
+        frames = [frame.convert_alpha() for frame in frames]
+
+    _animation_cache[key] = frames
+    return frames
+
+
+def load_animation_strip(filename):
+    """Кадры из PNG-ленты, записанной save_animation_strip, или None, если лента повреждена"""
+    try:
+        frame_count = int(os.path.splitext(filename)[0].rsplit('-', 1)[1])
+        strip = pygame.image.load(filename)
+    except (ValueError, pygame.error):
+        return None
+
+    if frame_count <= 0 or strip.get_width() % frame_count:
+        return None
+
+    frame_width = strip.get_width() // frame_count
+    return [strip.subsurface((i * frame_width, 0, frame_width, strip.get_height())).copy()
+            for i in range(frame_count)]
+
+
+def save_animation_strip(frames, filename):
+    if not frames:
+        return
+
+    width, height = frames[0].get_size()
+    strip = pygame.Surface((width * len(frames), height), pygame.SRCALPHA)
+    for i, frame in enumerate(frames):
+        strip.blit(frame, (i * width, 0))
+
+    # Кэш необязателен: если записать не удалось (например, каталог только для чтения), просто идём дальше
+    # Через временный файл с уникальным именем: несколько процессов могут запекать ленту одновременно,
+    # а прерванная запись не должна оставить ленту, которую найдут при следующем запуске
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pygame.image.save(strip, f, 'png')
+            os.replace(tmp_path, filename)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    except (OSError, pygame.error):
+        pass
+
+
+# magic, версия, число поворотов; затем на каждый поворот: угол, ширина, высота, смещения изображения и маски
+ROTATIONS_HEADER = struct.Struct('<4sHI')
+ROTATIONS_ENTRY = struct.Struct('<dHHII')
+ROTATIONS_MAGIC = b'ROTS'
+ROTATIONS_VERSION = 1
+
+_rotations_cache = {}
+
+
+def rotations_path(filename, scale_coef) -> str:
+    """Файл запечённых поворотов изображения; имя зависит от содержимого файла и масштаба"""
+    with open(os.path.join('assets', 'sprites', filename), 'rb') as f:
+        digest = hashlib.sha1(f.read() + str(scale_coef).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, 'rotations', f'{os.path.splitext(filename)[0]}-{digest}.bin')
+
+
+def bake_rotations(filename, scale_coef, angles) -> str:
+    """Записывает повёрнутые на angles копии изображения с масками в один файл и возвращает его путь.
+
+    Изображение хранится в BGRA (формат экрана, поэтому convert_alpha при загрузке — простое копирование),
+    маска — байт на пиксель: из 8-битной поверхности с colorkey маска строится в 2–3 раза быстрее, чем по альфе.
+    Нужно созданное окно (подойдёт и фиктивное), чтобы повороты совпадали с теми, что делает игра.
+    """
+    image = image_cache.get(filename, scale_coef)[0]
+    angles = sorted(set(angles) - {0})
+
+    entries = []
+    chunks = []
+    offset = ROTATIONS_HEADER.size + ROTATIONS_ENTRY.size * len(angles)
+    for angle in angles:
+        rotated = pygame.transform.rotate(image, angle)
+        mask = pygame.mask.from_surface(rotated)
+        image_data = pygame.image.tobytes(rotated, 'BGRA')
+        mask_data = pygame.image.tobytes(mask.to_surface(), 'RGBA')[::4]
+
+        entries.append(ROTATIONS_ENTRY.pack(angle, *rotated.get_size(), offset, offset + len(image_data)))
+        chunks += [image_data, mask_data]
+        offset += len(image_data) + len(mask_data)
+
+    path = rotations_path(filename, scale_coef)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(ROTATIONS_HEADER.pack(ROTATIONS_MAGIC, ROTATIONS_VERSION, len(angles)))
+        f.writelines(entries)
+        f.writelines(chunks)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def load_rotations(filename, scale_coef) -> dict:
+    """Запечённые повороты изображения: угол -> (размер, BGRA-данные, байты маски); пустой словарь, если их нет.
+
+    Файл собирается bake_platforms.py и открывается один раз на процесс.
+    """
+    key = (filename, scale_coef)
+    if key not in _rotations_cache:
+        rotations = {}
+        try:
+            # Отображение в память: с диска читаются только страницы тех углов, которые понадобились
+            with open(rotations_path(filename, scale_coef), 'rb') as f:
+                data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            magic, version, count = ROTATIONS_HEADER.unpack_from(data)
+            if magic == ROTATIONS_MAGIC and version == ROTATIONS_VERSION:
+                for i in range(count):
+                    angle, width, height, image_offset, mask_offset = ROTATIONS_ENTRY.unpack_from(
+                        data, ROTATIONS_HEADER.size + i * ROTATIONS_ENTRY.size)
+                    rotations[angle] = ((width, height),
+                                        data[image_offset:mask_offset],
+                                        data[mask_offset:mask_offset + width * height])
+        except (OSError, ValueError, struct.error):
+            rotations = {}
+
+        _rotations_cache[key] = rotations
+
+    return _rotations_cache[key]
+
+
+def load_rotation(rotation) -> tuple[pygame.Surface, pygame.mask.Mask]:
+    """Изображение и маска из записи load_rotations; поверхности копируются, чтобы не зависеть от файла"""
+    size, image_data, mask_data = rotation
+    image = pygame.image.frombuffer(image_data, size, 'BGRA')
+    image = image.convert_alpha() if pygame.display.get_surface() is not None else image.copy()
+
+    mask_surface = pygame.image.frombuffer(mask_data, size, 'P')
+    mask_surface.set_colorkey(0)
+    return image, pygame.mask.from_surface(mask_surface)
+
+
+class ImageCache:
+    """Общий на процесс кэш изображений спрайтов и их масок.
+
+    Ключ — (имя файла, коэффициент масштаба, угол поворота). Поверхности из кэша разделяются
+    между спрайтами, поэтому изменять их на месте нельзя. Если окно уже создано, изображение
+    переводится в формат экрана. Повороты берутся из запечённых load_rotations, если они есть,
+    иначе поворачиваются здесь же. Когда суммарный объём записей превышает max_bytes,
+    вытесняются давно не использовавшиеся; спрайты, которые уже держат поверхность, это не затрагивает.
+    """
+
+    def __init__(self, max_bytes=IMAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, filename, scale_coef=1, angle=0) -> tuple[pygame.Surface, pygame.mask.Mask]:
+        key = (filename, scale_coef, angle)
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            image, mask, _ = self.entries[key]
+            return image, mask
+
+        self.misses += 1
+        rotations = load_rotations(filename, scale_coef) if angle else {}
+        if angle in rotations:
+            image, mask = load_rotation(rotations[angle])
+        else:
+            if angle:
+                image = pygame.transform.rotate(self.get(filename, scale_coef)[0], angle)
+            else:
+                image = scale_image(load_image(filename), scale_coef)
+                if pygame.display.get_surface() is not None:
+                    image = image.convert_alpha()
+
+            mask = pygame.mask.from_surface(image)
+
+        size = image.get_pitch() * image.get_height() + (mask.get_size()[0] * mask.get_size()[1] + 7) // 8
+
+        self.entries[key] = (image, mask, size)
+        self.used_bytes += size
+        self.evict()
+
+        return image, mask
+
+    def evict(self):
+        while self.used_bytes > self.max_bytes and len(self.entries) > 1:
+            _, (_, _, size) = self.entries.popitem(last=False)
+            self.used_bytes -= size
+
+    def clear(self):
+        self.entries.clear()
+        self.used_bytes = 0
+
+
+image_cache = ImageCache()
+
+
 class Size:
     SMALL = 'small'
     MEDIUM = 'medium'
@@ -72,14 +312,11 @@ class SpriteBase(pygame.sprite.Sprite):
         screen.blit(self.image, self.rect)
 
     def setup_image(self, pos: tuple[int, int], filename: str, scale_coef = 1):
-        self.image = load_image(filename)
-        self.image = scale_image(self.image, scale_coef)
+        self.image, self.mask = image_cache.get(filename, scale_coef)
 
         self.rect = self.image.get_rect()
         self.set_pos(pos)
 
-        self.mask = pygame.mask.from_surface(self.image)
-
 
 class Platform(SpriteBase):
     SPRITE_FILENAME_TEMPLATE = 'platform-%s.png'
@@ -96,8 +333,6 @@ class Platform(SpriteBase):
         self.angle = .0
 
         self.setup_image(pos, self.SPRITE_FILENAME_TEMPLATE % size, self.SPRITE_SCALE_COEF)
-
-        self.base_image = self.image
         self.rotate(angle)
 
     def to_dict(self):
@@ -105,9 +340,9 @@ class Platform(SpriteBase):
 
     def rotate(self, angle):
         self.angle = (self.angle + angle) % 360
-        self.image = pygame.transform.rotate(self.base_image, self.angle)
+        self.image, self.mask = image_cache.get(self.SPRITE_FILENAME_TEMPLATE % self.size,
+                                                self.SPRITE_SCALE_COEF, self.angle)
         self.rect = self.image.get_rect(center=self.rect.center)
-        self.mask = pygame.mask.from_surface(self.image)
 
     def get_surface_height(self, x):
         local_x = x - self.rect.x
@@ -148,8 +383,7 @@ class Mine(SpriteBase):
 
         self.id = id
         self.setup_image(pos, self.SPRITE_FILENAME, self.SPRITE_SCALE_COEF)
-        self.boom_images = [scale_image(frame, self.BOOM_ANIMATION_SCALE_COEF) 
-                            for frame in load_GIF(self.BOOM_ANIMATION_FILENAME)]
+        self.boom_images = load_animation(self.BOOM_ANIMATION_FILENAME, self.BOOM_ANIMATION_SCALE_COEF)
         self.explosion_frame = -1
 
     def update(self):
@@ -0,0 +1,27 @@
+"""Беззнаковые целые переменной длины (LEB128): по 7 бит на байт, младшие первыми,
+старший бит байта означает, что число продолжается.
+
+Общая кодировка записанного ввода попыток (simulation) и траекторий призрака (ghost):
+версии этих форматов рассчитывают, что она не меняется.
+"""
+
+
+def write_varint(data: bytearray, value):
+    while value >= 0x80:
+        data.append(value & 0x7f | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def read_varint(data, offset):
+    """Читает число с позиции offset; возвращает (число, позиция после него). ValueError, если данные оборваны"""
+    value = shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError('Truncated varint')
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, offset